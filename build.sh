@@ -10,3 +10,6 @@ python manage.py collectstatic --no-input
 
 # Run migrations
 python manage.py migrate
+
+# Cache table for the default CACHE_BACKEND=db (does nothing for other backends)
+python manage.py createcachetable
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Connects the signal receivers that keep the platform counters, the
+        # response cache and the token versions current
+        from . import authentication, caching, counters  # noqa: F401
@@ -0,0 +1,199 @@
+"""
+Cold archive of ResourceReportHistory.
+
+``archive_history`` moves whole months older than ``history_hot_months`` out
+of the database into gzip'd JSON Lines segments under
+``settings.HFRAT_ARCHIVE_DIR``::
+
+    history/2026-03/facilities-000000-000999/000000123456.jsonl.gz
+
+Segments are partitioned by month and by blocks of FACILITY_BLOCK facility
+ids and are never rewritten. Each run adds a new segment named after the
+highest history id it covers, so after an interrupted run the next one can
+tell which rows left in the database are already archived. ``iter_history``
+streams rows back one line at a time. Daily rollups stay in the database,
+so daily and weekly trends never need the archive.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import caching, counters
+from .models import RESOURCE_FIELDS, ResourceReportHistory
+
+
+# Facility ids per partition directory
+FACILITY_BLOCK = 1000
+# One JSON array per line, in this column order
+SEGMENT_COLUMNS = ("facility_id", "timestamp", *RESOURCE_FIELDS, "sample_count")
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+def archive_root():
+    return Path(settings.HFRAT_ARCHIVE_DIR) / "history"
+
+
+def month_start(value):
+    """Start of the local calendar month containing ``value``"""
+    value = timezone.localtime(value)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    return timezone.make_aware(
+        datetime(start.year + month // 12, month % 12 + 1, 1))
+
+
+def _month_from_name(name):
+    return timezone.make_aware(datetime.strptime(name, "%Y-%m"))
+
+
+def _block_range(name):
+    _, low, high = name.split("-")
+    return int(low), int(high)
+
+
+def _archived_upto(directory):
+    """Highest history id already written to this partition, or 0"""
+    if not directory.is_dir():
+        return 0
+    return max(
+        (int(path.name[:-len(SEGMENT_SUFFIX)])
+         for path in directory.glob(f"*{SEGMENT_SUFFIX}")),
+        default=0,
+    )
+
+
+def horizon():
+    """End of the newest archived month, or None when nothing is archived"""
+    root = archive_root()
+    if not root.is_dir():
+        return None
+    months = sorted(path.name for path in root.iterdir() if path.is_dir())
+    return add_months(_month_from_name(months[-1]), 1) if months else None
+
+
+def _write_segment(directory, rows, upper_id):
+    """Write rows to a new segment, made visible only once complete; returns rows written"""
+    directory.mkdir(parents=True, exist_ok=True)
+    final = directory / f"{upper_id:012d}{SEGMENT_SUFFIX}"
+    partial = directory / f".{final.name}.tmp"
+    written = 0
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as segment:
+            for row in rows:
+                row = list(row)
+                row[1] = row[1].isoformat()
+                segment.write(json.dumps(row, separators=(",", ":")).encode() + b"\n")
+                written += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    if written:
+        os.replace(partial, final)
+    else:
+        partial.unlink()
+    return written
+
+
+def _delete(queryset, batch_size):
+    """Delete in batches of ids so each statement holds few locks"""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            batch = ResourceReportHistory.objects.filter(id__in=ids).delete_rows()
+            counters.add({counters.HISTORY: -batch})
+            # The rows move to the archive unchanged; only the stats change
+            caching.invalidate(caching.REPORTS)
+        deleted += batch
+
+
+def archive_history(hot_months, batch_size=5000, stdout=None):
+    """Move history before the hot months into segments; returns rows removed"""
+    cutoff = add_months(month_start(timezone.now()), -hot_months)
+    old = ResourceReportHistory.objects.filter(timestamp__lt=cutoff)
+    bounds = old.aggregate(upper_id=Max("id"), oldest=Min("timestamp"))
+    if bounds["upper_id"] is None:
+        return 0
+
+    removed = 0
+    month = month_start(bounds["oldest"])
+    while month < cutoff:
+        end = add_months(month, 1)
+        in_month = ResourceReportHistory.objects.filter(
+            timestamp__gte=month, timestamp__lt=end, id__lte=bounds["upper_id"])
+        blocks = sorted({
+            facility_id // FACILITY_BLOCK
+            for facility_id in in_month.values_list("facility_id", flat=True).distinct()
+        })
+
+        month_removed = 0
+        for block in blocks:
+            low = block * FACILITY_BLOCK
+            high = low + FACILITY_BLOCK - 1
+            rows = in_month.filter(facility_id__gte=low, facility_id__lte=high)
+            directory = archive_root() / f"{month:%Y-%m}" / f"facilities-{low:06d}-{high:06d}"
+
+            # Rows a previous, interrupted run archived but did not delete
+            done = _archived_upto(directory)
+            if done:
+                month_removed += _delete(rows.filter(id__lte=done), batch_size)
+                rows = rows.filter(id__gt=done)
+
+            written = _write_segment(
+                directory,
+                rows.order_by("facility_id", "timestamp")
+                .values_list(*SEGMENT_COLUMNS)
+                .iterator(chunk_size=batch_size),
+                bounds["upper_id"],
+            )
+            if written:
+                month_removed += _delete(rows, batch_size)
+
+        if month_removed and stdout is not None:
+            stdout.write(f"{month:%Y-%m}: {month_removed} rows archived")
+        removed += month_removed
+        month = end
+    return removed
+
+
+def iter_history(start=None, end=None, facility_ids=None):
+    """Stream archived rows as dicts, optionally limited to a time range and facilities.
+
+    Rows come month by month and facility block by block, ordered by
+    facility and time within each segment.
+    """
+    root = archive_root()
+    if not root.is_dir():
+        return
+    for month_dir in sorted(root.iterdir()):
+        if not month_dir.is_dir():
+            continue
+        month = _month_from_name(month_dir.name)
+        if (start and add_months(month, 1) <= start) or (end and month >= end):
+            continue
+        for block_dir in sorted(month_dir.iterdir()):
+            low, high = _block_range(block_dir.name)
+            if facility_ids is not None and not any(
+                    low <= facility_id <= high for facility_id in facility_ids):
+                continue
+            for path in sorted(block_dir.glob(f"*{SEGMENT_SUFFIX}")):
+                with gzip.open(path, "rt") as segment:
+                    for line in segment:
+                        row = dict(zip(SEGMENT_COLUMNS, json.loads(line)))
+                        if facility_ids is not None and row["facility_id"] not in facility_ids:
+                            continue
+                        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+                        if (start and row["timestamp"] < start) or (end and row["timestamp"] >= end):
+                            continue
+                        yield row
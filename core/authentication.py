@@ -0,0 +1,206 @@
+"""
+JWT authentication from token claims.
+
+Access tokens carry the user's role, facility and admin flags, so
+``request.user`` is a ClaimsUser built from the token and the permission
+classes never load the User row. Each token also carries the user's
+``token_version``; bumping it (``revoke_tokens``) rejects every token issued
+before. Saving a user whose claims or password changed bumps it (see the
+receivers below), wherever the save comes from.
+
+The current version is cached in two tiers so most requests never reach a
+database: in process memory for TOKEN_VERSION_LOCAL_SECONDS, then in the
+default cache for TOKEN_VERSION_CACHE_SECONDS (the database cache by
+default, which costs a query). A revocation applies at once in the process
+that makes it and within TOKEN_VERSION_LOCAL_SECONDS in the others.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Facility, User
+
+
+VERSION_CLAIM = "ver"
+
+# User columns behind the claims, plus the password: changing any of them
+# revokes the user's tokens
+CLAIM_COLUMNS = ("username", "role", "facility_id", "is_staff", "is_superuser",
+                 "is_active", "password")
+
+
+def token_claims(user):
+    return {
+        "username": user.username,
+        "role": user.role,
+        "facility_id": user.facility_id,
+        "is_staff": user.is_staff,
+        "is_superuser": user.is_superuser,
+        VERSION_CLAIM: user.token_version,
+    }
+
+
+# Per-process tier in front of the default cache
+local_versions = LocMemCache("hfrat-token-versions", {"OPTIONS": {"MAX_ENTRIES": 10000}})
+
+
+def _version_key(user_id):
+    return f"token_version:{user_id}"
+
+
+def token_version(user_id):
+    """Current token version of an active user, or None"""
+    key = _version_key(user_id)
+    version = local_versions.get(key)
+    if version is None:
+        version = cache.get(key)
+        if version is None:
+            version = User.objects.filter(pk=user_id, is_active=True).values_list(
+                "token_version", flat=True).first()
+            # -1 caches "no such active user"
+            version = -1 if version is None else version
+            cache.set(key, version, getattr(settings, "TOKEN_VERSION_CACHE_SECONDS", 60))
+        local_versions.set(key, version, getattr(settings, "TOKEN_VERSION_LOCAL_SECONDS", 15))
+    return None if version == -1 else version
+
+
+def revoke_tokens(user_ids):
+    """Invalidate every token issued so far to these users"""
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(token_version=F("token_version") + 1)
+    forget_versions(user_ids)
+
+
+def forget_versions(user_ids):
+    """Drop cached versions after users changed or were deleted"""
+    keys = [_version_key(user_id) for user_id in user_ids]
+    local_versions.delete_many(keys)
+    cache.delete_many(keys)
+
+
+STREAM_TOKEN_SALT = "core.authentication.stream"
+
+
+def stream_token(user_id):
+    """Short-lived token that can only open dashboard streams.
+
+    EventSource cannot send headers, so the stream takes its credentials in
+    the URL, where proxies and access logs record them; this token is
+    useless anywhere else and expires after STREAM_TOKEN_SECONDS.
+    """
+    return signing.dumps(
+        {"user_id": user_id, VERSION_CLAIM: token_version(user_id)}, salt=STREAM_TOKEN_SALT)
+
+
+def stream_user(token):
+    """The active user a stream token was issued to, or None if expired or revoked"""
+    try:
+        payload = signing.loads(
+            token, salt=STREAM_TOKEN_SALT,
+            max_age=getattr(settings, "STREAM_TOKEN_SECONDS", 60))
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    user = User.objects.filter(pk=payload.get("user_id"), is_active=True).first()
+    if user is None or user.token_version != payload.get(VERSION_CLAIM):
+        return None
+    return user
+
+
+class ClaimsUser(TokenUser):
+    """request.user backed by the access token's claims"""
+
+    @cached_property
+    def id(self):
+        # Tokens store the id as a string; compare like User.id
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token.get("role")
+
+    @cached_property
+    def facility_id(self):
+        return self.token.get("facility_id")
+
+    @cached_property
+    def facility(self):
+        # Only loaded by the views that need the facility itself
+        if self.facility_id is None:
+            return None
+        return Facility.objects.filter(pk=self.facility_id).first()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token's claims instead of loading the user"""
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Issued before claims were added; look the user up as before
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if validated_token[VERSION_CLAIM] != token_version(user_id):
+            raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+        return ClaimsUser(validated_token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in token_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses revoked refresh tokens and issues access tokens with current claims"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if VERSION_CLAIM in refresh:
+            user = User.objects.filter(
+                pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+            if user is None or refresh[VERSION_CLAIM] != user.token_version:
+                raise InvalidToken("Token has been revoked.")
+            # Access tokens copy the refresh token's claims; take them from
+            # the user row instead of what was true at login
+            for claim, value in token_claims(user).items():
+                refresh[claim] = value
+            attrs = {**attrs, "refresh": str(refresh)}
+        return super().validate(attrs)
+
+
+@receiver(pre_save, sender=User)
+def _remember_claims(sender, instance, update_fields=None, **kwargs):
+    instance._claims_changed = False
+    if instance._state.adding or (
+            update_fields is not None and not set(update_fields) & {
+                User._meta.get_field(column).name for column in CLAIM_COLUMNS}):
+        return
+    stored = User.objects.filter(pk=instance.pk).values_list(*CLAIM_COLUMNS).first()
+    instance._claims_changed = stored is not None and stored != tuple(
+        getattr(instance, column) for column in CLAIM_COLUMNS)
+
+
+@receiver(post_save, sender=User)
+def _revoke_changed_claims(sender, instance, **kwargs):
+    if instance.__dict__.pop("_claims_changed", False):
+        User.objects.filter(pk=instance.pk).update(token_version=F("token_version") + 1)
+        instance.token_version += 1
+        transaction.on_commit(lambda: forget_versions([instance.pk]))
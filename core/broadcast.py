@@ -0,0 +1,145 @@
+"""
+Fan-out of dashboard changes to connected monitor streams.
+
+``broadcaster.publish()`` is called from the synchronous request path once a
+report is committed; every open stream in this process receives the message
+through its own asyncio queue. The transport between processes is pluggable
+through ``settings.HFRAT_BROADCAST_BACKEND``:
+
+- ``core.broadcast.LocalBackend`` (default): delivers within the publishing
+  process only. Enough for a single ASGI worker.
+- ``core.broadcast.PostgresBackend``: uses LISTEN/NOTIFY so every worker
+  connected to the same PostgreSQL database sees every message.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Messages are dropped for a subscriber that falls this far behind
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LocalBackend:
+    """Delivers messages to subscribers of the publishing process"""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def start(self):
+        pass
+
+    def publish(self, message):
+        self.deliver(message)
+
+
+class PostgresBackend:
+    """Shares messages between workers through PostgreSQL LISTEN/NOTIFY"""
+    channel = "hfrat_dashboard"
+    poll_timeout = 30
+    reconnect_delay = 5
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(
+            target=self._listen, name="hfrat-broadcast-listener", daemon=True
+        ).start()
+
+    def publish(self, message):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)",
+                           [self.channel, message])
+
+    def _listen(self):
+        from django.db import connections
+
+        while True:
+            wrapper = connections.create_connection("default")
+            try:
+                wrapper.ensure_connection()
+                conn = wrapper.connection
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                while True:
+                    readable, _, _ = select.select(
+                        [conn], [], [], self.poll_timeout)
+                    if not readable:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.deliver(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Broadcast listener lost its connection")
+            finally:
+                wrapper.close()
+            time.sleep(self.reconnect_delay)
+
+
+class Broadcaster:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            backend_path = getattr(
+                settings, "HFRAT_BROADCAST_BACKEND", "core.broadcast.LocalBackend")
+            self._backend = import_string(backend_path)(self._deliver)
+        return self._backend
+
+    def publish(self, message):
+        """Send a JSON string to every subscriber, in all workers"""
+        try:
+            self.backend.publish(message)
+        except Exception:
+            # Live updates are best effort; never fail the write that caused them
+            logger.exception("Could not publish dashboard update")
+
+    def _deliver(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_offer, queue, message)
+
+    def subscribe(self):
+        """Register a queue on the running event loop; pair with unsubscribe()"""
+        self.backend.start()
+        subscriber = (asyncio.get_running_loop(),
+                      asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,227 @@
+"""
+Response cache for the read-heavy endpoints.
+
+Entries are keyed by the generation of every scope they depend on, e.g.
+the dashboard by REPORTS and the stats by REPORTS and USERS, and by the
+settings version when they depend on the thresholds. A write bumps
+its scopes' generations once its transaction commits, so the next read
+misses and recomputes; nothing is deleted and nothing stale can be served
+afterwards. Single-row saves bump through the signals below; the bulk
+write paths (reporting, provisioning, retention, ...) send no signals and
+call ``invalidate`` themselves, like they call ``counters.add``.
+
+Generations live in the default cache, so every process sharing that
+cache (CACHE_BACKEND, the database by default) sees a write at once. With
+a per-process backend a write made by another process shows after
+RESPONSE_CACHE_SECONDS at most.
+
+Only one process computes a missing entry at a time; the others wait for
+it instead of repeating the same queries (see ``get_or_compute``). The
+lock relies on an atomic ``cache.add``, which the file backend does not
+provide: there two processes may occasionally both compute an entry.
+"""
+import hashlib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import settings_registry
+from .models import Facility, ResourceReport, ResourceReportHistory, SystemSetting, User
+
+
+# Current reports, their history and the facilities
+REPORTS = "reports"
+USERS = "users"
+# Trend buckets before today; bumped by backfills and maintenance
+PAST_TRENDS = "trends:past"
+
+# Facilities above which a write bumps the shared trend scopes instead of
+# one scope per facility
+MAX_FACILITY_SCOPES = 100
+
+# How long a process may hold the lock on an entry it is computing, and
+# how often the others check whether it is done
+LOCK_SECONDS = 30
+LOCK_POLL_SECONDS = 0.05
+
+# Writes this close to midnight also invalidate the day ending
+COMMIT_MARGIN = timedelta(minutes=5)
+
+_MISSING = object()
+
+
+def trend_scope(facility_id):
+    return f"trends:{facility_id}"
+
+
+def past_trend_scope(facility_id):
+    return f"trends:past:{facility_id}"
+
+
+def _key(*parts):
+    digest = hashlib.md5(
+        "|".join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return f"hfrat:{parts[0]}:{digest.hexdigest()}"
+
+
+def _generation_key(scope):
+    return f"hfrat:gen:{scope}"
+
+
+def generations(*scopes):
+    """Current generation of each scope, starting any that are not set"""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # A new random start never matches entries keyed before an eviction
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def _bump(scopes):
+    cache.set_many({_generation_key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+
+class _Bump:
+    """on_commit callback bumping every scope invalidated in one transaction"""
+
+    def __init__(self, scopes):
+        self.scopes = set(scopes)
+
+    def __call__(self):
+        _bump(self.scopes)
+
+
+def invalidate(*scopes):
+    """Bump the scopes now, or when the current transaction commits"""
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump(scopes)
+        return
+    # One bump per transaction however many rows it writes; a callback
+    # still queued belongs to this transaction or an enclosing savepoint
+    for _, callback, _ in connection.run_on_commit:
+        if isinstance(callback, _Bump):
+            callback.scopes.update(scopes)
+            return
+    transaction.on_commit(_Bump(scopes))
+
+
+def invalidate_trends(facility_ids, earliest=None):
+    """Invalidate the trends of facilities whose history was written.
+
+    ``earliest`` is the oldest timestamp written; rows before today also
+    invalidate the past days cached by ``fetch_chunks``. None invalidates
+    those too.
+    """
+    # A transaction started before midnight may commit after the day was cached
+    past = earliest is None or timezone.localdate(earliest) < timezone.localdate(
+        timezone.now() + COMMIT_MARGIN)
+    facility_ids = set(facility_ids)
+    if len(facility_ids) > MAX_FACILITY_SCOPES:
+        scopes = [REPORTS, trend_scope("all")]
+        if past:
+            scopes.append(PAST_TRENDS)
+    else:
+        scopes = [REPORTS, *map(trend_scope, facility_ids)]
+        if past:
+            scopes.extend(map(past_trend_scope, facility_ids))
+    invalidate(*scopes)
+
+
+def get_or_compute(key, compute, timeout):
+    """Cached value of ``key``, computed by one process at a time on a miss"""
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock = f"{key}:lock"
+    deadline = time.monotonic() + LOCK_SECONDS
+    while not cache.add(lock, 1, LOCK_SECONDS):
+        time.sleep(LOCK_POLL_SECONDS)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if time.monotonic() >= deadline:
+            # The holder died or is stuck; do not wait for it again
+            return compute()
+    try:
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock)
+    return value
+
+
+def entry_key(parts, scopes):
+    """Key of the entry for ``parts`` at the current generation of ``scopes``"""
+    return _key(*parts, *generations(*scopes))
+
+
+def fetch(parts, scopes, compute, key=None):
+    """``compute()``, cached until any of ``scopes`` changes.
+
+    ``parts`` identify the entry: the endpoint and everything its result
+    depends on besides the scopes, such as the query parameters. ``key`` is
+    their ``entry_key`` when the caller already has it.
+    """
+    key = key or entry_key(parts, scopes)
+    return get_or_compute(key, compute, getattr(settings, "RESPONSE_CACHE_SECONDS", 300))
+
+
+def fetch_chunks(parts, chunks, scopes, compute, timeout):
+    """{chunk: value} for each of ``chunks``, each cached on its own.
+
+    For results made of parts that rarely change, such as past days of a
+    trend. ``compute(missing)`` returns {chunk: value} for the chunks not
+    cached, in the order given.
+    """
+    generation = generations(*scopes)
+    keys = {chunk: _key(*parts, chunk, *generation) for chunk in chunks}
+    found = cache.get_many(keys.values())
+    values = {chunk: found[key] for chunk, key in keys.items() if key in found}
+    missing = [chunk for chunk in chunks if chunk not in values]
+    if missing:
+        computed = compute(missing)
+        cache.set_many({keys[chunk]: computed[chunk] for chunk in missing}, timeout)
+        values.update(computed)
+    return values
+
+
+@receiver([post_save, post_delete], sender=ResourceReport)
+def _report_changed(sender, **kwargs):
+    invalidate(REPORTS)
+
+
+# Archiving and retention delete with delete_rows(), which sends no
+# signals, and invalidate explicitly
+@receiver([post_save, post_delete], sender=ResourceReportHistory)
+def _history_changed(sender, instance, **kwargs):
+    invalidate_trends([instance.facility_id], instance.timestamp)
+
+
+@receiver([post_save, post_delete], sender=Facility)
+def _facility_changed(sender, instance, **kwargs):
+    invalidate(REPORTS, trend_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, **kwargs):
+    invalidate(USERS)
+
+
+@receiver([post_save, post_delete], sender=SystemSetting)
+def _setting_changed(sender, **kwargs):
+    # Moves the version stamp the settings registry and the entries depend on
+    transaction.on_commit(settings_registry.invalidate)
@@ -0,0 +1,49 @@
+"""
+Conditional GET support for the endpoints the frontend polls.
+
+The dashboard and trend ETags follow their response cache entry, whose
+key changes with every write to the data they show, so an unchanged poll
+is answered with 304 Not Modified from a single cache lookup. They carry no
+Last-Modified: no timestamp moves on every such write (deletes, renames,
+backfills), and it would be shared by every query string.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _etag(*parts):
+    digest = hashlib.md5(
+        "|".join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def entry_etag(key):
+    """ETag for a response cached under ``key`` (see caching.entry_key)"""
+    return _etag(key)
+
+
+def settings_validators(system_settings):
+    return _etag("settings", system_settings.version), system_settings.last_updated
+
+
+def not_modified(request, etag, last_modified):
+    """304 response if the client's validators still match, otherwise None"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Clients may store the response but must revalidate before reuse
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,254 @@
+"""
+Maintained platform counters.
+
+The admin statistics read a few PlatformCounter rows instead of counting
+every table (the history alone can hold tens of millions of rows). Every
+write adjusts the counters in its own transaction: single-row saves and
+deletes (the Django admin, scripts) through the signals below, the bulk
+statements of the write paths explicitly, since they send no signals.
+Bulk history deletes use ``delete_rows()`` so that the history signals
+neither load the rows nor count them twice. ``reconcile`` recomputes
+everything from the tables to repair any drift.
+
+Each counter is spread over SLOTS rows and every ``add`` picks one at
+random, so concurrent writers rarely queue on the same row lock. Call
+``add`` once per transaction, with all its deltas, so its row locks are
+always taken in name order; wrap bulk operations whose signals would call
+it per row in ``deferred()``.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    RESOURCE_FIELDS,
+    Facility,
+    PlatformCounter,
+    ResourceReport,
+    ResourceReportHistory,
+    User,
+)
+
+
+SLOTS = 8
+
+FACILITIES = "facilities"
+USERS = "users"
+REPORTS = "reports"
+HISTORY = "history_records"
+ROLE_PREFIX = "users:role:"
+COUNTRY_PREFIX = "facilities:country:"
+RESOURCE_PREFIX = "reports:"
+
+
+def role_counter(role):
+    return f"{ROLE_PREFIX}{role}"
+
+
+def country_counter(country):
+    return f"{COUNTRY_PREFIX}{country}"
+
+
+def resource_counter(field):
+    return f"{RESOURCE_PREFIX}{field}"
+
+
+_pending = threading.local()
+
+
+@contextmanager
+def deferred():
+    """Collect the ``add`` calls made inside the block and apply them as one at the end"""
+    if getattr(_pending, "deltas", None) is not None:
+        yield
+        return
+    _pending.deltas = []
+    try:
+        yield
+        deltas = _pending.deltas
+    finally:
+        _pending.deltas = None
+    add(*deltas)
+
+
+def add(*deltas):
+    """Add one or more {counter name: delta} dicts to the counters"""
+    if getattr(_pending, "deltas", None) is not None:
+        _pending.deltas.extend(deltas)
+        return
+    total = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            total[name] = total.get(name, 0) + value
+    total = {name: value for name, value in total.items() if value}
+    if not total:
+        return
+
+    slot = random.randrange(SLOTS)
+    with transaction.atomic(savepoint=False):
+        for name in sorted(total):
+            counter = PlatformCounter.objects.filter(name=name, slot=slot)
+            if not counter.update(value=F("value") + total[name]):
+                PlatformCounter.objects.bulk_create(
+                    [PlatformCounter(name=name, slot=slot)], ignore_conflicts=True)
+                counter.update(value=F("value") + total[name])
+
+
+def report_deltas(reports, current):
+    """Deltas for upserting ``reports`` over ``current`` {facility_id: values}"""
+    deltas = {}
+    for report in reports:
+        old = current.get(report.facility_id)
+        if old is None:
+            deltas[REPORTS] = deltas.get(REPORTS, 0) + 1
+            old = (0,) * len(RESOURCE_FIELDS)
+        for field, previous in zip(RESOURCE_FIELDS, old):
+            name = resource_counter(field)
+            deltas[name] = deltas.get(name, 0) + getattr(report, field) - previous
+    return deltas
+
+
+def snapshot():
+    """{counter name: value} for every counter"""
+    return dict(
+        PlatformCounter.objects.values("name")
+        .annotate(total=Sum("value"))
+        .values_list("name", "total")
+    )
+
+
+def _actual():
+    """Every counter recomputed from the tables"""
+    values = {
+        FACILITIES: Facility.objects.count(),
+        USERS: User.objects.count(),
+        HISTORY: ResourceReportHistory.objects.count(),
+    }
+    for role, count in User.objects.values_list("role").annotate(count=Count("id")).order_by():
+        values[role_counter(role)] = count
+    for country, count in Facility.objects.values_list("country").annotate(count=Count("id")).order_by():
+        values[country_counter(country)] = count
+    totals = ResourceReport.objects.aggregate(
+        count=Count("id"), **{field: Sum(field) for field in RESOURCE_FIELDS})
+    values[REPORTS] = totals.pop("count")
+    for field in RESOURCE_FIELDS:
+        values[resource_counter(field)] = totals[field] or 0
+    return {name: value for name, value in values.items() if value}
+
+
+def reconcile():
+    """Reset every counter to its actual value; returns {name: drift corrected}"""
+    with transaction.atomic():
+        # Writers adding to existing slots wait until the counters are reset
+        list(PlatformCounter.objects.select_for_update().order_by("name", "slot").values_list("id"))
+        counted = {name: value for name, value in snapshot().items() if value}
+        actual = _actual()
+        PlatformCounter.objects.all().delete()
+        PlatformCounter.objects.bulk_create([
+            PlatformCounter(name=name, value=value) for name, value in actual.items()
+        ])
+    return {
+        name: actual.get(name, 0) - counted.get(name, 0)
+        for name in counted.keys() | actual.keys()
+        if actual.get(name, 0) != counted.get(name, 0)
+    }
+
+
+def _previous(model, instance, field, update_fields):
+    """The stored value of ``field`` before a save that may change it"""
+    if instance._state.adding or (update_fields is not None and field not in update_fields):
+        return None
+    return model.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=User)
+def _remember_role(sender, instance, update_fields=None, **kwargs):
+    instance._counted_role = _previous(User, instance, "role", update_fields)
+
+
+@receiver(post_save, sender=User)
+def _count_user(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop("_counted_role", None)
+    if created:
+        add({USERS: 1, role_counter(instance.role): 1})
+    elif previous is not None and previous != instance.role:
+        add({role_counter(previous): -1, role_counter(instance.role): 1})
+
+
+@receiver(post_delete, sender=User)
+def _uncount_user(sender, instance, **kwargs):
+    add({USERS: -1, role_counter(instance.role): -1})
+
+
+@receiver(pre_save, sender=Facility)
+def _remember_country(sender, instance, update_fields=None, **kwargs):
+    instance._counted_country = _previous(Facility, instance, "country", update_fields)
+
+
+@receiver(post_save, sender=Facility)
+def _count_facility(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop("_counted_country", None)
+    if created:
+        add({FACILITIES: 1, country_counter(instance.country): 1})
+    elif previous is not None and previous != instance.country:
+        add({country_counter(previous): -1, country_counter(instance.country): 1})
+
+
+@receiver(pre_delete, sender=Facility)
+def _uncount_facility(sender, instance, **kwargs):
+    # The history cascades too; one count here instead of a signal per row
+    add({
+        FACILITIES: -1,
+        country_counter(instance.country): -1,
+        HISTORY: -ResourceReportHistory.objects.filter(facility=instance).count(),
+    })
+
+
+def _report_values(report):
+    return tuple(getattr(report, field) for field in RESOURCE_FIELDS)
+
+
+@receiver(pre_save, sender=ResourceReport)
+def _remember_report(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (
+            update_fields is not None and not set(update_fields) & set(RESOURCE_FIELDS)):
+        instance._counted_values = None
+        return
+    instance._counted_values = ResourceReport.objects.filter(
+        pk=instance.pk).values_list(*RESOURCE_FIELDS).first()
+
+
+@receiver(post_save, sender=ResourceReport)
+def _count_report(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop("_counted_values", None)
+    if created:
+        add(report_deltas([instance], {}))
+    elif previous is not None and previous != _report_values(instance):
+        add(report_deltas([instance], {instance.facility_id: previous}))
+
+
+@receiver(post_delete, sender=ResourceReport)
+def _uncount_report(sender, instance, **kwargs):
+    deltas = {REPORTS: -1}
+    for field, value in zip(RESOURCE_FIELDS, _report_values(instance)):
+        deltas[resource_counter(field)] = -value
+    add(deltas)
+
+
+@receiver(post_save, sender=ResourceReportHistory)
+def _count_history(sender, created, **kwargs):
+    if created:
+        add({HISTORY: 1})
+
+
+@receiver(post_delete, sender=ResourceReportHistory)
+def _uncount_history(sender, origin=None, **kwargs):
+    # A facility's history is counted by _uncount_facility
+    if isinstance(origin, Facility) or getattr(origin, "model", None) is Facility:
+        return
+    add({HISTORY: -1})
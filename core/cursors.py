@@ -0,0 +1,38 @@
+"""
+Opaque cursors handed to API clients.
+
+A cursor is a small JSON object signed with SECRET_KEY
+(``django.core.signing``). Its values end up in queries, so a cursor that
+was not issued by this server, or was altered, is rejected with 400.
+"""
+import json
+
+from django.core import signing
+from rest_framework.exceptions import ValidationError
+
+
+SALT = "core.cursors"
+
+
+class _JSONSerializer:
+    """signing's JSON serializer, writing dates and decimals as strings"""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), default=str).encode("latin-1")
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+def encode_cursor(payload):
+    return signing.dumps(payload, salt=SALT, serializer=_JSONSerializer, compress=True)
+
+
+def decode_cursor(cursor, param="cursor"):
+    try:
+        payload = signing.loads(cursor, salt=SALT, serializer=_JSONSerializer)
+    except (signing.BadSignature, ValueError):
+        raise ValidationError({param: "Invalid cursor."})
+    if not isinstance(payload, dict):
+        raise ValidationError({param: "Invalid cursor."})
+    return payload
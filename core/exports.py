@@ -0,0 +1,298 @@
+"""
+Data exports.
+
+Every export reads a ``values_list()`` queryset through ``.iterator()``, so
+no model instances are built and memory stays flat however many rows are
+exported. ``?format=`` picks the output:
+
+- ``xlsx``: written in openpyxl's write-only mode; rows go to disk as they
+  arrive, styled cells refer to a few shared named styles, and the file is
+  streamed back once complete (an XLSX file is a zip archive whose
+  directory is written last, so it cannot be sent row by row).
+- ``csv`` and ``ndjson``: generated and sent row by row, gzip-compressed
+  on the fly when the client accepts it.
+
+With ``?shard=country`` the export is split by facility country, each
+country encoded in its own process and the files zipped together, so a
+full export uses every core instead of one.
+"""
+import csv
+import datetime
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from django.utils.text import compress_sequence, get_valid_filename
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import APISettings
+
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CONTENT_TYPES = {
+    "xlsx": XLSX_CONTENT_TYPE,
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+# Rows joined into each chunk sent to the client (and to the compressor)
+ROWS_PER_WRITE = 500
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Leaves ?format= to the export views instead of picking a renderer with it"""
+    settings = APISettings({"URL_FORMAT_OVERRIDE": None})
+
+
+def export_format(request, allowed, default):
+    value = request.query_params.get("format", default)
+    if value not in allowed:
+        raise ValidationError({"format": f"Must be one of: {', '.join(allowed)}."})
+    return value
+
+
+def _plain(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(keys, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(keys)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_plain(value) for value in row]))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def ndjson_chunks(keys, rows):
+    batch = []
+    for row in rows:
+        batch.append(json.dumps(
+            dict(zip(keys, (_plain(value) for value in row)))) + "\n")
+        if len(batch) >= ROWS_PER_WRITE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+class Dataset:
+    """One export's rows and how to label them in each format.
+
+    ``columns`` is a list of ``(key, header, width)``: ``key`` names the
+    value in CSV and NDJSON, ``header`` and ``width`` (or None) describe the
+    Excel column. ``xlsx_row`` optionally rewrites each row for Excel and
+    ``cell_styles`` maps a column index to a function returning the named
+    style for a value in that column.
+    """
+
+    def __init__(self, name, title, columns, rows, xlsx_row=None,
+                 header_style=None, cell_styles=None):
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.rows = rows
+        self.xlsx_row = xlsx_row
+        self.header_style = header_style
+        self.cell_styles = cell_styles or {}
+
+    @property
+    def keys(self):
+        return [key for key, _, _ in self.columns]
+
+    def filename(self, export, sharded=False):
+        if sharded:
+            return f"{self.name}_by_country.zip"
+        return f"{self.name}.{export}"
+
+
+def _text_chunks(dataset, export):
+    chunks = (csv_chunks if export == "csv" else ndjson_chunks)(dataset.keys, dataset.rows)
+    return (chunk.encode() for chunk in chunks)
+
+
+def _named_styles():
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+    return [
+        NamedStyle(
+            name="export_header",
+            font=Font(color="FFFFFF", bold=True, size=12),
+            fill=PatternFill(start_color="2563eb", end_color="2563eb", fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(
+            name="status_critical",
+            font=Font(color="b91c1c", bold=True),
+            fill=PatternFill(start_color="fee2e2", end_color="fee2e2", fill_type="solid"),
+        ),
+        NamedStyle(
+            name="status_ok",
+            font=Font(color="166534", bold=True),
+            fill=PatternFill(start_color="ecfdf3", end_color="ecfdf3", fill_type="solid"),
+        ),
+    ]
+
+
+def status_style(value):
+    return "status_critical" if value == "CRITICAL" else "status_ok"
+
+
+def _styled(sheet, value, style):
+    from openpyxl.cell import WriteOnlyCell
+
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.style = style
+    return cell
+
+
+def _save_workbook(dataset, target):
+    """Write the dataset as a one-sheet write-only workbook to a path or file"""
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    for style in _named_styles():
+        workbook.add_named_style(style)
+    sheet = workbook.create_sheet(dataset.title)
+    for index, (_, _, width) in enumerate(dataset.columns, 1):
+        if width:
+            sheet.column_dimensions[get_column_letter(index)].width = width
+
+    sheet.append([
+        _styled(sheet, header, dataset.header_style) if dataset.header_style else header
+        for _, header, _ in dataset.columns
+    ])
+    for row in dataset.rows:
+        if dataset.xlsx_row:
+            row = dataset.xlsx_row(row)
+        if dataset.cell_styles:
+            row = list(row)
+            for index, style in dataset.cell_styles.items():
+                row[index] = _styled(sheet, row[index], style(row[index]))
+        sheet.append(row)
+    workbook.save(target)
+
+
+def export_response(request, dataset, export):
+    """Send the dataset in the requested format.
+
+    CSV and NDJSON stream row by row, gzip'd if the client accepts it; XLSX
+    is spooled to a temporary file and streamed from there.
+    """
+    filename = dataset.filename(export)
+    if export == "xlsx":
+        output = tempfile.TemporaryFile()
+        _save_workbook(dataset, output)
+        output.seek(0)
+        return FileResponse(
+            output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+    chunks = _text_chunks(dataset, export)
+    gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+    if gzip:
+        chunks = compress_sequence(chunks)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[export])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if gzip:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def write_export(dataset, export, path):
+    """Write the dataset to ``path`` in the given format"""
+    if export == "xlsx":
+        _save_workbook(dataset, path)
+        return
+    with open(path, "wb") as output:
+        for chunk in _text_chunks(dataset, export):
+            output.write(chunk)
+
+
+def _init_shard_worker():
+    import django
+
+    # Needed when the pool spawns rather than forks its processes
+    django.setup()
+
+
+def _write_shard(view_path, params, export, path):
+    write_export(import_string(view_path).dataset(params), export, path)
+    return path
+
+
+def _shard_name(country, export, taken):
+    """A file name for a country's shard, unique among ``taken`` (updated)"""
+    try:
+        base = get_valid_filename(country)
+    except SuspiciousFileOperation:
+        # Nothing usable left after cleaning, e.g. "???"
+        base = "unknown"
+    name, suffix = f"{base}.{export}", 1
+    # Different countries can clean to the same name ("A/B" and "A B")
+    while name.lower() in taken:
+        suffix += 1
+        name = f"{base}_{suffix}.{export}"
+    taken.add(name.lower())
+    return name
+
+
+def write_sharded(view_path, params, export, countries, target):
+    """Zip one ``export`` file per country into ``target`` (a path or file).
+
+    Each country's rows come from ``<view_path>.dataset()`` with ``country``
+    set, encoded in a pool of EXPORT_WORKERS processes.
+    """
+    workers = min(getattr(settings, "EXPORT_WORKERS", None) or os.cpu_count() or 1,
+                  len(countries)) or 1
+    compression = zipfile.ZIP_STORED if export == "xlsx" else zipfile.ZIP_DEFLATED
+    with tempfile.TemporaryDirectory() as directory, \
+            zipfile.ZipFile(target, "w", compression) as archive:
+        names = {}
+        taken = set()
+        for country in countries:
+            names[country] = _shard_name(country, export, taken)
+
+        if workers == 1:
+            for country in countries:
+                path = _write_shard(view_path, {**params, "country": country}, export,
+                                    os.path.join(directory, names[country]))
+                archive.write(path, names[country])
+                os.remove(path)
+            return
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(workers, initializer=_init_shard_worker) as pool:
+            futures = {
+                pool.submit(_write_shard, view_path, {**params, "country": country},
+                            export, os.path.join(directory, names[country])): country
+                for country in countries
+            }
+            for future in as_completed(futures):
+                path = future.result()
+                archive.write(path, names[futures[future]])
+                os.remove(path)
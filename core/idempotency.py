@@ -0,0 +1,109 @@
+"""
+Idempotency-Key handling for report submissions.
+
+A retried request carrying the same key gets the stored response back
+without repeating the write. Keys are scoped per user and expire after
+``settings.IDEMPOTENCY_KEY_TTL_HOURS``; ``manage.py prune_idempotency_keys``
+deletes expired rows.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 100
+
+
+def key_ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        return Response(
+            {"detail": f"{HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored.response_body, status=stored.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _stored(request, key):
+    return IdempotencyKey.objects.filter(
+        user_id=request.user.id,
+        key=key,
+        created_at__gte=timezone.now() - key_ttl(),
+    ).first()
+
+
+def idempotent(request, handler):
+    """Run ``handler()`` once per Idempotency-Key and replay its response.
+
+    Requests without the header run normally. Only successful responses are
+    stored, in the same transaction as the write they describe.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fingerprint = _fingerprint(request)
+    stored = _stored(request, key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    try:
+        with transaction.atomic():
+            response = handler()
+            if status.is_success(response.status_code):
+                # An expired row may still hold the key until it is pruned. A
+                # live one stored by a concurrent retry must stay, so the
+                # unique constraint fails below and this write rolls back
+                IdempotencyKey.objects.filter(
+                    user_id=request.user.id, key=key,
+                    created_at__lt=timezone.now() - key_ttl()).delete()
+                IdempotencyKey.objects.create(
+                    user_id=request.user.id,
+                    key=key,
+                    request_hash=fingerprint,
+                    response_status=response.status_code,
+                    response_body=response.data,
+                )
+    except IntegrityError:
+        # A concurrent retry stored the key first; our write was rolled back
+        stored = _stored(request, key)
+        if stored is None:
+            raise
+        return _replay(stored, fingerprint)
+    return response
+
+
+def prune(batch_size=5000):
+    """Delete expired keys in bounded batches; returns the number deleted"""
+    cutoff = timezone.now() - key_ttl()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(
+            created_at__lt=cutoff).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,170 @@
+"""
+Database-backed background jobs.
+
+Requests that would hold a web worker too long (large exports) enqueue a Job
+row and answer 202 with its id. ``manage.py run_jobs`` workers claim pending
+jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of them can poll
+the same table without running a job twice, and write results under
+``settings.JOB_OUTPUT_DIR``. While a job runs its worker refreshes
+``heartbeat_at``; a job whose heartbeat stops is handed back to the queue.
+No broker is needed.
+"""
+import logging
+import os
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .exports import write_export, write_sharded
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Export views whose dataset() builds each kind of job's rows
+EXPORT_VIEWS = {
+    Job.Kind.DASHBOARD_EXPORT: "core.views.MonitorExportDashboardView",
+    Job.Kind.USERS_EXPORT: "core.views.AdminExportUsersView",
+    Job.Kind.HISTORY_EXPORT: "core.views.MonitorExportHistoryView",
+}
+# Runs started before a worker died are retried this many times in total
+MAX_ATTEMPTS = 3
+# Seconds between heartbeats of a running job
+HEARTBEAT_INTERVAL = 60
+
+
+def output_dir():
+    return Path(settings.JOB_OUTPUT_DIR)
+
+
+def result_file(job):
+    return output_dir() / job.result_path
+
+
+def enqueue(kind, user_id, params):
+    return Job.objects.create(kind=kind, created_by_id=user_id, params=params)
+
+
+def claim():
+    """Mark the oldest pending job as running and return it, or None"""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.PENDING)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.Status.RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts"])
+    return job
+
+
+def heartbeat(job):
+    """Record that this run of ``job`` is still alive; False once it was requeued"""
+    return Job.objects.filter(
+        pk=job.pk, status=Job.Status.RUNNING, attempts=job.attempts,
+    ).update(heartbeat_at=timezone.now()) > 0
+
+
+@contextmanager
+def _beating(job):
+    """Send heartbeats for ``job`` from a thread until the block exits"""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    heartbeat(job)
+                except Exception:
+                    logger.exception("Heartbeat of job %s failed", job.pk)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _run_export(job):
+    view = import_string(EXPORT_VIEWS[job.kind])
+    export = job.params["format"]
+    sharded = bool(job.params.get("shard"))
+    dataset = view.dataset(job.params)
+
+    directory = output_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = dataset.filename(export, sharded=sharded)
+    final = directory / f"{job.pk}-{filename}"
+    partial = directory / f".{final.name}.tmp"
+    if sharded:
+        write_sharded(EXPORT_VIEWS[job.kind], job.params, export,
+                      view.shards(job.params), partial)
+    else:
+        write_export(dataset, export, partial)
+    os.replace(partial, final)
+
+    job.result_path = final.name
+    job.result_name = filename
+
+
+def run(job):
+    """Run a claimed job and record its outcome"""
+    try:
+        with _beating(job):
+            _run_export(job)
+    except Exception:
+        logger.exception("Job %s failed", job.pk)
+        job.status = Job.Status.FAILED
+        job.error = traceback.format_exc(limit=5)
+    else:
+        job.status = Job.Status.SUCCEEDED
+        job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "status", "error", "finished_at", "result_path", "result_name"])
+
+
+def requeue_stale():
+    """Hand jobs whose heartbeat stopped back to the queue; returns (requeued, failed)"""
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=getattr(settings, "JOB_TIMEOUT_MINUTES", 10))
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=Job.Status.RUNNING,
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=Job.Status.FAILED,
+        finished_at=now,
+        error=f"Worker stopped responding on {MAX_ATTEMPTS} attempts.",
+    )
+    requeued = stale.update(status=Job.Status.PENDING)
+    return requeued, failed
+
+
+def prune():
+    """Delete finished jobs and their files once past JOB_RESULT_TTL_HOURS"""
+    cutoff = timezone.now() - timedelta(
+        hours=getattr(settings, "JOB_RESULT_TTL_HOURS", 24))
+    expired = Job.objects.filter(finished_at__lt=cutoff)
+    for result_path in expired.exclude(result_path="").values_list(
+            "result_path", flat=True).iterator():
+        (output_dir() / result_path).unlink(missing_ok=True)
+    deleted, _ = expired.delete()
+    return deleted
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.retention import GRANULARITIES, downsample_history
+from core.settings_registry import get_settings
+
+
+class Command(BaseCommand):
+    help = ("Downsample resource report history older than the "
+            "history_retention_days setting into hourly or daily averages")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, help="Override history_retention_days")
+        parser.add_argument(
+            "--granularity", choices=sorted(GRANULARITIES),
+            help="Override history_downsample_granularity")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Approximate rows rewritten per transaction")
+
+    def handle(self, *args, **options):
+        system_settings = get_settings()
+        days = options["days"]
+        if days is None:
+            days = system_settings.get_int("history_retention_days")
+        granularity = options["granularity"] or system_settings.get(
+            "history_downsample_granularity")
+        if granularity not in GRANULARITIES:
+            raise CommandError(
+                f"history_downsample_granularity must be one of: {', '.join(sorted(GRANULARITIES))}")
+        if days < 1:
+            raise CommandError("Retention must be at least 1 day")
+
+        removed = downsample_history(
+            days, granularity, batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Downsampled history older than {days} days to {granularity} buckets; "
+            f"{removed} rows removed"))
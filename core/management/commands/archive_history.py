@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archive import archive_history, archive_root
+from core.settings_registry import get_settings
+
+
+class Command(BaseCommand):
+    help = ("Move resource report history older than the history_hot_months "
+            "setting into compressed segment files under HFRAT_ARCHIVE_DIR")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months", type=int, help="Override history_hot_months")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Rows read and deleted per statement")
+
+    def handle(self, *args, **options):
+        months = options["months"]
+        if months is None:
+            months = get_settings().get_int("history_hot_months")
+        if months < 1:
+            raise CommandError("At least 1 month must stay in the database")
+
+        removed = archive_history(
+            months, batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {removed} history rows older than {months} months to {archive_root()}"))
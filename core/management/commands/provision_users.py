@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.provisioning import provision_users, read_csv
+
+
+class Command(BaseCommand):
+    help = ("Create users in bulk from a CSV file (with a header row) or a JSON "
+            "list, using the fields of the admin create-user endpoint")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON file, or - for stdin")
+        parser.add_argument(
+            "--format", choices=["csv", "json"],
+            help="Input format (default: from the file extension, else csv)")
+        parser.add_argument(
+            "--workers", type=int,
+            help="Processes used to hash passwords (default: one per CPU)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        input_format = options["format"] or ("json" if path.endswith(".json") else "csv")
+        try:
+            if path == "-":
+                rows = self._read(sys.stdin, input_format)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as source:
+                    rows = self._read(source, input_format)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {path}: {exc}")
+        if not isinstance(rows, list):
+            raise CommandError("Expected a list of users")
+
+        created, results = provision_users(
+            rows, workers=options["workers"] or os.cpu_count() or 1)
+        for result in results:
+            if result["status"] == "error":
+                self.stderr.write(
+                    f"Row {result['index'] + 1} ({result['username']}): {json.dumps(result['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} users; {len(rows) - created} rows failed"))
+
+    def _read(self, source, input_format):
+        if input_format == "json":
+            rows = json.load(source)
+            return rows.get("users") if isinstance(rows, dict) else rows
+        return read_csv(source)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import prune
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = prune(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired idempotency keys"))
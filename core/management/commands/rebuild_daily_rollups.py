@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the daily resource report rollups used by trend queries "
+            "from ResourceReportHistory, one day per transaction")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int,
+            help="Only rebuild this many most recent days (default: all history)")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Rollup rows written per INSERT statement")
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is not None and days < 1:
+            raise CommandError("--days must be at least 1")
+
+        rebuilt = rebuild_rollups(
+            days, batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt daily rollups for {rebuilt} days"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = ("Recompute the platform counters behind the admin statistics "
+            "from the tables and correct any drift")
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for name, delta in sorted(drift.items()):
+            self.stdout.write(f"{name}: {delta:+d}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled platform counters ({len(drift)} corrected)"))
@@ -0,0 +1,55 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+
+
+# Seconds between requeueing stale jobs and pruning expired results
+MAINTENANCE_INTERVAL = 300
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs such as large exports. Start one or "
+            "more of these next to the web server; stop with SIGTERM")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of waiting for jobs")
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0,
+            help="Seconds to wait between polls of an empty queue")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._stop)
+
+        last_maintenance = None
+        while not self.stopping:
+            close_old_connections()
+            if last_maintenance is None or time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                requeued, failed = jobs.requeue_stale()
+                pruned = jobs.prune()
+                if requeued or failed or pruned:
+                    self.stdout.write(
+                        f"Requeued {requeued} and failed {failed} stale jobs; pruned {pruned}")
+                last_maintenance = time.monotonic()
+
+            job = jobs.claim()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running {job.kind} #{job.pk}")
+            jobs.run(job)
+            self.stdout.write(f"{job.kind} #{job.pk}: {job.status}")
+
+    def _stop(self, signum, frame):
+        # Finish the current job, then exit
+        self.stopping = True
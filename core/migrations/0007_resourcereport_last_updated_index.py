@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_settingsversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resourcereport',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_history_client_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resourcereporthistory',
+            name='sample_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='resourcereporthistory',
+            index=models.Index(fields=['facility', 'timestamp'], name='history_facility_time_idx'),
+        ),
+        migrations.AlterField(
+            model_name='resourcereporthistory',
+            name='facility',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='report_history', to='core.facility'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_history_facility_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceReportDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('icu_beds_available_sum', models.PositiveBigIntegerField(default=0)),
+                ('icu_beds_available_min', models.PositiveIntegerField()),
+                ('icu_beds_available_max', models.PositiveIntegerField()),
+                ('ventilators_available_sum', models.PositiveBigIntegerField(default=0)),
+                ('ventilators_available_min', models.PositiveIntegerField()),
+                ('ventilators_available_max', models.PositiveIntegerField()),
+                ('staff_on_duty_sum', models.PositiveBigIntegerField(default=0)),
+                ('staff_on_duty_min', models.PositiveIntegerField()),
+                ('staff_on_duty_max', models.PositiveIntegerField()),
+                ('facility', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.facility')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('facility', 'day'), name='rollup_facility_day')],
+            },
+        ),
+    ]
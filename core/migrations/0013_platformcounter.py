@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+RESOURCE_FIELDS = ("icu_beds_available", "ventilators_available", "staff_on_duty")
+
+
+def count_existing(apps, schema_editor):
+    """Start the counters from the current tables (as core.counters.reconcile does)"""
+    Facility = apps.get_model("core", "Facility")
+    User = apps.get_model("core", "User")
+    ResourceReport = apps.get_model("core", "ResourceReport")
+    ResourceReportHistory = apps.get_model("core", "ResourceReportHistory")
+    PlatformCounter = apps.get_model("core", "PlatformCounter")
+
+    values = {
+        "facilities": Facility.objects.count(),
+        "users": User.objects.count(),
+        "history_records": ResourceReportHistory.objects.count(),
+        "reports": ResourceReport.objects.count(),
+    }
+    for role, count in User.objects.values_list("role").annotate(count=models.Count("id")).order_by():
+        values[f"users:role:{role}"] = count
+    for country, count in Facility.objects.values_list("country").annotate(count=models.Count("id")).order_by():
+        values[f"facilities:country:{country}"] = count
+    totals = ResourceReport.objects.aggregate(
+        **{field: models.Sum(field) for field in RESOURCE_FIELDS})
+    for field in RESOURCE_FIELDS:
+        values[f"reports:{field}"] = totals[field] or 0
+    PlatformCounter.objects.bulk_create([
+        PlatformCounter(name=name, value=value) for name, value in values.items() if value
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('slot', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'slot'), name='counter_name_slot')],
+            },
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
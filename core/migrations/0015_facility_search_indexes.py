@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-17 16:10
+
+from django.db import migrations
+
+
+# Case-insensitive name lookups (istartswith/icontains) used by facility
+# search. PostgreSQL compares UPPER(name) with LIKE, which a trigram GIN
+# index serves for prefixes and substrings alike; SQLite can only use an
+# index for a case-insensitive LIKE prefix when the index is NOCASE.
+INDEXES = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS facility_name_trgm_idx "
+        "ON core_facility USING gin (UPPER(name) gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE INDEX IF NOT EXISTS facility_name_nocase_idx "
+        "ON core_facility (name COLLATE NOCASE)",
+    ],
+}
+INDEX_NAMES = {
+    "postgresql": "facility_name_trgm_idx",
+    "sqlite": "facility_name_nocase_idx",
+}
+
+
+def create_indexes(apps, schema_editor):
+    for statement in INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_indexes(apps, schema_editor):
+    name = INDEX_NAMES.get(schema_editor.connection.vendor)
+    if name:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-17 16:45
+
+from django.db import migrations
+
+
+# Case-insensitive username prefix search (istartswith) on the admin user
+# list; see 0015 for why each database needs its own kind of index.
+INDEXES = {
+    "postgresql": (
+        "user_username_upper_idx",
+        "CREATE INDEX IF NOT EXISTS user_username_upper_idx "
+        "ON core_user (UPPER(username) text_pattern_ops)",
+    ),
+    "sqlite": (
+        "user_username_nocase_idx",
+        "CREATE INDEX IF NOT EXISTS user_username_nocase_idx "
+        "ON core_user (username COLLATE NOCASE)",
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    index = INDEXES.get(schema_editor.connection.vendor)
+    if index:
+        schema_editor.execute(index[1])
+
+
+def drop_index(apps, schema_editor):
+    index = INDEXES.get(schema_editor.connection.vendor)
+    if index:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index[0]}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_facility_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_user_username_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resourcereport',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['name', 'id'], name='facility_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['country', 'id'], name='facility_country_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['city', 'id'], name='facility_city_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resourcereport',
+            index=models.Index(fields=['last_updated', 'facility'], name='report_updated_facility_idx'),
+        ),
+    ]
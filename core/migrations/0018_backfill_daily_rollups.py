@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-17 21:40
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+RESOURCE_FIELDS = ("icu_beds_available", "ventilators_available", "staff_on_duty")
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the history stored before the rollups existed (as core.rollups.rebuild_rollups does)"""
+    ResourceReportHistory = apps.get_model("core", "ResourceReportHistory")
+    ResourceReportDailyRollup = apps.get_model("core", "ResourceReportDailyRollup")
+
+    totals = (
+        ResourceReportHistory.objects
+        .annotate(day=TruncDate("timestamp"))
+        .values("facility_id", "day")
+        .annotate(
+            samples=models.Sum("sample_count"),
+            **{f"{field}_sum": models.Sum(models.F(field) * models.F("sample_count"))
+               for field in RESOURCE_FIELDS},
+            **{f"{field}_min": models.Min(field) for field in RESOURCE_FIELDS},
+            **{f"{field}_max": models.Max(field) for field in RESOURCE_FIELDS},
+        )
+        .order_by("facility_id", "day")
+    )
+    ResourceReportDailyRollup.objects.bulk_create(
+        [
+            ResourceReportDailyRollup(sample_count=total.pop("samples"), **total)
+            for total in totals
+        ],
+        batch_size=1000,
+        # Rows written since 0011 are recomputed from the full history
+        update_conflicts=True,
+        unique_fields=["facility", "day"],
+        update_fields=["sample_count"] + [
+            f"{field}_{part}" for field in RESOURCE_FIELDS for part in ("sum", "min", "max")
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_dashboard_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,25 @@
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser
 
 
 class Facility(models.Model):
+    # Case-insensitive search index created per database in migration 0015
     name = models.CharField(max_length=255)
     country = models.CharField(max_length=120)
     city = models.CharField(max_length=120)
 
     class Meta:
         unique_together = ("name", "country", "city")
+        # Keyset pages of the dashboard ordered by facility column; the
+        # reports' unique facility_id is the tiebreaker
+        indexes = [
+            models.Index(fields=["name", "id"], name="facility_name_id_idx"),
+            models.Index(fields=["country", "id"], name="facility_country_id_idx"),
+            models.Index(fields=["city", "id"], name="facility_city_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -30,6 +39,8 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    # Embedded in issued tokens; bumping it revokes them (core.authentication)
+    token_version = models.PositiveIntegerField(default=0)
 
     def clean(self):
         super().clean()
@@ -56,6 +67,38 @@ class User(AbstractUser):
         return self.username
 
 
+# Numeric columns shared by reports, history snapshots and rollups
+RESOURCE_FIELDS = (
+    "icu_beds_available",
+    "ventilators_available",
+    "staff_on_duty",
+)
+
+
+def critical_condition(thresholds):
+    """Q matching reports at or below any critical threshold"""
+    condition = models.Q()
+    for field, threshold in thresholds.items():
+        condition |= models.Q(**{f"{field}__lte": threshold})
+    return condition
+
+
+class ResourceReportQuerySet(models.QuerySet):
+    def with_status(self, thresholds):
+        """Annotate each report with its CRITICAL/OK status"""
+        return self.annotate(
+            status=models.Case(
+                models.When(critical_condition(thresholds),
+                            then=models.Value("CRITICAL")),
+                default=models.Value("OK"),
+                output_field=models.CharField(),
+            )
+        )
+
+    def critical(self, thresholds):
+        return self.filter(critical_condition(thresholds))
+
+
 class ResourceReport(models.Model):
     facility = models.OneToOneField(
         Facility,
@@ -67,30 +110,107 @@ class ResourceReport(models.Model):
     staff_on_duty = models.PositiveIntegerField()
     last_updated = models.DateTimeField(auto_now=True)
 
+    objects = ResourceReportQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["last_updated", "facility"],
+                         name="report_updated_facility_idx"),
+        ]
+
     def __str__(self):
         return f"Resource report for {self.facility.name}"
 
 
+class ResourceReportHistoryQuerySet(models.QuerySet):
+    def delete_rows(self):
+        """DELETE the rows in one statement, without loading them or sending signals.
+
+        For the bulk paths (archiving, retention), which adjust the counters
+        and caches themselves; returns the number of rows deleted.
+        """
+        return self._raw_delete(self.db)
+
+
 class ResourceReportHistory(models.Model):
     """Historical snapshots of resource reports for trend analysis"""
     facility = models.ForeignKey(
         Facility,
         on_delete=models.CASCADE,
         related_name="report_history",
+        # Covered by the (facility, timestamp) index below
+        db_index=False,
     )
     icu_beds_available = models.PositiveIntegerField()
     ventilators_available = models.PositiveIntegerField()
     staff_on_duty = models.PositiveIntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Defaults to server time; offline backlogs supply the reading time
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Raw snapshots count 1; downsampled rows hold the average of this many
+    sample_count = models.PositiveIntegerField(default=1)
+
+    objects = ResourceReportHistoryQuerySet.as_manager()
 
     class Meta:
         ordering = ["-timestamp"]
         verbose_name_plural = "Resource report histories"
+        indexes = [
+            models.Index(fields=["facility", "timestamp"],
+                         name="history_facility_time_idx"),
+        ]
 
     def __str__(self):
         return f"{self.facility.name} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
 
+class ResourceReportDailyRollup(models.Model):
+    """Per-facility daily totals of ResourceReportHistory, kept up to date on write"""
+    facility = models.ForeignKey(
+        Facility,
+        on_delete=models.CASCADE,
+        related_name="daily_rollups",
+        # Covered by the (facility, day) unique constraint below
+        db_index=False,
+    )
+    day = models.DateField()
+    sample_count = models.PositiveIntegerField(default=0)
+    icu_beds_available_sum = models.PositiveBigIntegerField(default=0)
+    icu_beds_available_min = models.PositiveIntegerField()
+    icu_beds_available_max = models.PositiveIntegerField()
+    ventilators_available_sum = models.PositiveBigIntegerField(default=0)
+    ventilators_available_min = models.PositiveIntegerField()
+    ventilators_available_max = models.PositiveIntegerField()
+    staff_on_duty_sum = models.PositiveBigIntegerField(default=0)
+    staff_on_duty_min = models.PositiveIntegerField()
+    staff_on_duty_max = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["facility", "day"], name="rollup_facility_day")
+        ]
+
+    def __str__(self):
+        return f"{self.facility.name} - {self.day:%Y-%m-%d}"
+
+
+class PlatformCounter(models.Model):
+    """One slot of a platform-wide count or total kept up to date on write (see core.counters)"""
+    name = models.CharField(max_length=200)
+    slot = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "slot"], name="counter_name_slot")
+        ]
+
+    def __str__(self):
+        return f"{self.name}[{self.slot}] = {self.value}"
+
+
 class SystemSetting(models.Model):
     """System-wide configuration settings for thresholds and parameters"""
     key = models.CharField(max_length=100, unique=True,
@@ -122,3 +242,81 @@ class SystemSetting(models.Model):
 
     def __str__(self):
         return f"{self.key} = {self.value}"
+
+
+class SettingsVersion(models.Model):
+    """Single-row version stamp bumped whenever system settings change"""
+    SINGLETON_ID = 1
+
+    version = models.PositiveBigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Settings version {self.version}"
+
+
+class IdempotencyKey(models.Model):
+    """Response stored for a client-supplied Idempotency-Key, replayed on retries"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+    key = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_per_user")
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
+
+
+class Job(models.Model):
+    """Background work queued by a request and run by ``manage.py run_jobs``"""
+    class Kind(models.TextChoices):
+        DASHBOARD_EXPORT = "DASHBOARD_EXPORT", _("Dashboard export")
+        USERS_EXPORT = "USERS_EXPORT", _("Users export")
+        HISTORY_EXPORT = "HISTORY_EXPORT", _("History export")
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        RUNNING = "RUNNING", _("Running")
+        SUCCEEDED = "SUCCEEDED", _("Succeeded")
+        FAILED = "FAILED", _("Failed")
+
+    kind = models.CharField(max_length=40, choices=Kind.choices)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Result file under settings.JOB_OUTPUT_DIR and the name it downloads as
+    result_path = models.CharField(max_length=255, blank=True)
+    result_name = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"],
+                         name="job_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
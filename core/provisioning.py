@@ -0,0 +1,265 @@
+"""
+Bulk user and facility provisioning.
+
+``provision_users`` creates many users from rows shaped like the
+admin/create-user/ body. Rows are validated one by one and bad rows are
+reported without blocking the others; facilities are resolved for the
+whole batch at once, and the users and any new facilities are inserted
+with bulk_create in one transaction. Password hashing (PBKDF2) is CPU-bound
+and dominates the cost: ``manage.py provision_users`` spreads it over a
+process pool, while the admin endpoint hashes its request-sized batches in
+process, since forking from a web worker is unsafe.
+
+``import_facilities`` reads a facilities CSV row by row and inserts new
+(name, country, city) triples batch by batch, so files of any size run in
+constant memory.
+"""
+import codecs
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from . import caching, counters
+from .models import Facility, User
+from .serializers import AdminCreateUserSerializer
+
+
+# Rows per bulk INSERT
+BATCH_SIZE = 500
+# Passwords sent to a hashing process at a time
+HASH_CHUNK_SIZE = 16
+
+
+class CSVParser(BaseParser):
+    """Parses a CSV body with a header row into a list of dicts"""
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_csv(stream)
+
+
+def _csv_rows(stream):
+    """Iterate the rows of a CSV file (binary or text) with a header, as dicts.
+
+    An empty body (no stream) has no rows; bytes that are not UTF-8 raise
+    ParseError (400).
+    """
+    if stream is None:
+        return
+    if not isinstance(stream, io.TextIOBase):
+        stream = codecs.getreader("utf-8-sig")(stream)
+    try:
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if key and value not in (None, "")}
+    except UnicodeDecodeError:
+        raise ParseError("The CSV file must be UTF-8 encoded.")
+
+
+def read_csv(stream):
+    """Rows of a CSV file (binary or text) with a header, as dicts"""
+    return list(_csv_rows(stream))
+
+
+def hash_passwords(passwords, workers=1):
+    """make_password() for each password, spread over ``workers`` processes"""
+    workers = min(workers, -(-len(passwords) // HASH_CHUNK_SIZE))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=HASH_CHUNK_SIZE))
+
+
+def _existing_facilities(keys):
+    """{(name, country, city): Facility} for the keys already stored"""
+    found = {}
+    candidates = Facility.objects.filter(
+        name__in={name for name, _, _ in keys},
+        country__in={country for _, country, _ in keys},
+        city__in={city for _, _, city in keys},
+    )
+    for facility in candidates.iterator():
+        key = (facility.name, facility.country, facility.city)
+        if key in keys:
+            found[key] = facility
+    return found
+
+
+def _create_facilities(keys, existing):
+    """Insert the keys missing from ``existing``; returns (facilities, created keys).
+
+    Rows created concurrently are skipped by the insert, so the keys
+    created are those stored now that were not in ``existing``.
+    """
+    Facility.objects.bulk_create(
+        [Facility(name=name, country=country, city=city)
+         for name, country, city in sorted(keys - existing.keys())],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    facilities = _existing_facilities(keys)
+    created = facilities.keys() - existing.keys()
+    if created:
+        caching.invalidate(caching.REPORTS)
+    return facilities, created
+
+
+def _facility_deltas(created):
+    """Counter deltas for the facilities created"""
+    deltas = {counters.FACILITIES: len(created)} if created else {}
+    for _, country, _ in created:
+        name = counters.country_counter(country)
+        deltas[name] = deltas.get(name, 0) + 1
+    return deltas
+
+
+def _resolve_facilities(keys):
+    """{(name, country, city): Facility}, creating the missing ones; returns (facilities, created keys)"""
+    facilities = _existing_facilities(keys)
+    if facilities.keys() >= keys:
+        return facilities, set()
+    return _create_facilities(keys, facilities)
+
+
+def provision_users(rows, workers=1):
+    """Create a user per row; returns (created count, per-row results)"""
+    results = [None] * len(rows)
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows):
+        serializer = AdminCreateUserSerializer(data=row)
+        if not serializer.is_valid():
+            results[index] = {
+                "index": index,
+                "username": row.get("username") if isinstance(row, dict) else None,
+                "status": "error",
+                "errors": serializer.errors,
+            }
+            continue
+        data = serializer.validated_data
+        if data["username"] in seen:
+            results[index] = {"index": index, "username": data["username"], "status": "error",
+                              "errors": {"username": ["Username appears more than once in this batch."]}}
+            continue
+        seen.add(data["username"])
+        valid.append((index, data))
+
+    taken = set(User.objects.filter(username__in=seen).values_list("username", flat=True))
+    pending = []
+    for index, data in valid:
+        if data["username"] in taken:
+            results[index] = {"index": index, "username": data["username"], "status": "error",
+                              "errors": {"username": ["A user with that username already exists."]}}
+        else:
+            pending.append((index, data))
+    if not pending:
+        return 0, results
+
+    hashes = hash_passwords([data["password"] for _, data in pending], workers)
+
+    with transaction.atomic():
+        facilities, new_facilities = _resolve_facilities({
+            (data["hospital_name"], data["country"], data["city"])
+            for _, data in pending if data["role"] == User.Role.REPORTER
+        })
+        users = [
+            User(
+                username=data["username"],
+                password=password,
+                role=data["role"],
+                facility=facilities.get(
+                    (data.get("hospital_name"), data.get("country"), data.get("city"))),
+            )
+            for (_, data), password in zip(pending, hashes)
+        ]
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        caching.invalidate(caching.USERS)
+        # A username taken since the check above keeps the other user's row;
+        # each inserted row is recognised by its (uniquely salted) hash
+        stored = {
+            username: (user_id, password)
+            for username, user_id, password in User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list("username", "id", "password")
+        }
+
+        created = []
+        for (index, data), user in zip(pending, users):
+            user_id, password = stored.get(user.username, (None, None))
+            if password != user.password:
+                results[index] = {"index": index, "username": user.username, "status": "error",
+                                  "errors": {"username": ["A user with that username already exists."]}}
+                continue
+            user.id = user_id
+            created.append(user)
+            results[index] = {
+                "index": index,
+                "username": user.username,
+                "status": "ok",
+                "user": AdminCreateUserSerializer().to_representation(user),
+            }
+
+        deltas = {counters.USERS: len(created)}
+        for user in created:
+            name = counters.role_counter(user.role)
+            deltas[name] = deltas.get(name, 0) + 1
+        counters.add(deltas, _facility_deltas(new_facilities))
+    return len(created), results
+
+
+FACILITY_COLUMNS = ("name", "country", "city")
+
+
+def _facility_key(row):
+    """(name, country, city) from a CSV row, and the row's errors"""
+    key, errors = [], {}
+    for column in FACILITY_COLUMNS:
+        value = (row.get(column) or "").strip()
+        limit = Facility._meta.get_field(column).max_length
+        if not value:
+            errors[column] = ["This field is required."]
+        elif len(value) > limit:
+            errors[column] = [f"Ensure this field has no more than {limit} characters."]
+        key.append(value)
+    return tuple(key), errors
+
+
+def import_facilities(stream, batch_size=BATCH_SIZE, max_errors=100):
+    """Create the facilities listed in a CSV stream; returns a summary.
+
+    Each batch is committed on its own, so batches before a decoding error
+    stay stored. Rows already stored, or repeated in the file, count as
+    ``existing``; the first ``max_errors`` invalid rows
+    are listed by line number.
+    """
+    summary = {"created": 0, "existing": 0, "failed": 0, "errors": []}
+    batch = set()
+
+    def flush():
+        with transaction.atomic():
+            _, created = _resolve_facilities(batch)
+            counters.add(_facility_deltas(created))
+        summary["created"] += len(created)
+        summary["existing"] += len(batch) - len(created)
+        batch.clear()
+
+    # Line 1 is the header
+    for line, row in enumerate(_csv_rows(stream), 2):
+        key, errors = _facility_key(row)
+        if errors:
+            summary["failed"] += 1
+            if len(summary["errors"]) < max_errors:
+                summary["errors"].append({"line": line, "errors": errors})
+        elif key in batch:
+            summary["existing"] += 1
+        else:
+            batch.add(key)
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return summary
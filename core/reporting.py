@@ -0,0 +1,167 @@
+"""
+Write path for resource reports.
+
+Every way of submitting reports goes through here so the report upsert, the
+history snapshot, the platform counters and the live dashboard push stay
+consistent. The bulk statements send no signals, so the response cache is
+invalidated here too.
+"""
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, counters
+from .broadcast import broadcaster
+from .models import RESOURCE_FIELDS, ResourceReport, ResourceReportHistory
+from .rollups import add_to_rollups
+from .settings_registry import get_settings
+
+
+def publish_reports(reports):
+    """Push reports to live dashboard streams once they are committed"""
+    from .serializers import DashboardFacilityReportSerializer
+
+    if not reports:
+        return
+    data = DashboardFacilityReportSerializer(
+        reports, many=True, context={"system_settings": get_settings()}).data
+    messages = [json.dumps(row, default=str) for row in data]
+
+    def publish():
+        for message in messages:
+            broadcaster.publish(message)
+
+    transaction.on_commit(publish)
+
+
+def _current(facilities):
+    """Lock the facilities' existing reports; returns {facility_id: values}"""
+    return {
+        row[0]: row[1:]
+        for row in ResourceReport.objects.select_for_update().filter(
+            facility__in=facilities
+        ).values_list("facility_id", *RESOURCE_FIELDS)
+    }
+
+
+def _upsert(reports, current):
+    """INSERT ... ON CONFLICT (facility) DO UPDATE; returns the counter deltas"""
+    ResourceReport.objects.bulk_create(
+        reports,
+        update_conflicts=True,
+        unique_fields=["facility"],
+        update_fields=[*RESOURCE_FIELDS, "last_updated"],
+    )
+    caching.invalidate(caching.REPORTS)
+    return counters.report_deltas(reports, current)
+
+
+def _snapshot(report):
+    return ResourceReportHistory(
+        facility=report.facility,
+        **{field: getattr(report, field) for field in RESOURCE_FIELDS},
+    )
+
+
+def _record_history(rows):
+    """Insert history snapshots and fold them into the daily rollups.
+
+    Returns the counter deltas.
+    """
+    ResourceReportHistory.objects.bulk_create(rows)
+    add_to_rollups(rows)
+    if rows:
+        caching.invalidate_trends(
+            {row.facility_id for row in rows}, min(row.timestamp for row in rows))
+    return {counters.HISTORY: len(rows)}
+
+
+def submit_report(facility, values):
+    """Save one facility's report atomically; returns (report, changed).
+
+    Resubmitting the current numbers only refreshes ``last_updated`` as a
+    heartbeat and writes no history row.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        unchanged = ResourceReport.objects.filter(
+            facility=facility, **values).update(last_updated=now)
+        if unchanged:
+            report = ResourceReport(
+                facility=facility, last_updated=now, **values)
+            # The heartbeat still moves last_updated on the dashboard
+            caching.invalidate(caching.REPORTS)
+        else:
+            report = ResourceReport(facility=facility, **values)
+            counters.add(
+                _upsert([report], _current([facility])),
+                _record_history([_snapshot(report)]),
+            )
+        publish_reports([report])
+    return report, not unchanged
+
+
+def save_reports(entries):
+    """Upsert many facilities' reports and snapshot them in one transaction.
+
+    ``entries`` is a list of ``(facility, values)`` pairs with at most one
+    entry per facility; ``values`` holds the RESOURCE_FIELDS. Facilities
+    whose numbers did not change get no history row. Returns the saved
+    ResourceReport objects in the same order.
+    """
+    reports = [ResourceReport(facility=facility, **values)
+               for facility, values in entries]
+    if not reports:
+        return reports
+
+    with transaction.atomic():
+        current = _current([report.facility for report in reports])
+        counters.add(
+            _upsert(reports, current),
+            _record_history([
+                _snapshot(report) for report in reports
+                if current.get(report.facility_id) != tuple(
+                    getattr(report, field) for field in RESOURCE_FIELDS)
+            ]),
+        )
+        publish_reports(reports)
+    return reports
+
+
+def save_backlog(facility, readings):
+    """Store a reporter's offline readings; returns the report if it moved.
+
+    ``readings`` are validated values with ``recorded_at``, sorted oldest
+    first. Every reading becomes a history row at its own time; the current
+    report only takes the newest one, and only if nothing newer was
+    submitted while the device was offline.
+    """
+    if not readings:
+        return None
+
+    newest = readings[-1]
+    with transaction.atomic():
+        history = _record_history([
+            ResourceReportHistory(
+                facility=facility,
+                timestamp=reading["recorded_at"],
+                **{field: reading[field] for field in RESOURCE_FIELDS},
+            )
+            for reading in readings
+        ])
+
+        existing = ResourceReport.objects.select_for_update().filter(
+            facility=facility).values_list("last_updated", *RESOURCE_FIELDS).first()
+        if existing is not None and existing[0] >= newest["recorded_at"]:
+            counters.add(history)
+            return None
+
+        report = ResourceReport(
+            facility=facility,
+            **{field: newest[field] for field in RESOURCE_FIELDS},
+        )
+        current = {} if existing is None else {facility.id: existing[1:]}
+        counters.add(history, _upsert([report], current))
+        publish_reports([report])
+    return report
@@ -0,0 +1,106 @@
+"""
+Retention policy for ResourceReportHistory.
+
+Raw snapshots older than ``history_retention_days`` are replaced by one row
+per facility and hour (or day, per ``history_downsample_granularity``)
+holding the average values and the number of snapshots averaged in
+``sample_count``. Work is split into transactions of roughly ``batch_size``
+rows so no single statement holds locks on a large part of the table.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from . import caching, counters
+from .models import RESOURCE_FIELDS, ResourceReportHistory
+
+
+GRANULARITIES = {
+    "hourly": TruncHour,
+    "daily": TruncDay,
+}
+
+
+def _start_of_day(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _compact(window, facility_ids, trunc):
+    """Replace one window's rows for the given facilities by bucket averages"""
+    with transaction.atomic():
+        rows = ResourceReportHistory.objects.filter(
+            facility_id__in=facility_ids,
+            timestamp__gte=window[0],
+            timestamp__lt=window[1],
+        )
+        last_id = rows.aggregate(last_id=Max("id"))["last_id"]
+        if last_id is None:
+            return 0
+        # Average and delete the same rows, whatever a backlog inserts meanwhile
+        rows = rows.filter(id__lte=last_id)
+        buckets = list(
+            rows.annotate(bucket=trunc("timestamp"))
+            .values("facility_id", "bucket")
+            .annotate(
+                samples=Sum("sample_count"),
+                **{field: Sum(F(field) * F("sample_count")) for field in RESOURCE_FIELDS},
+            )
+            .order_by()
+        )
+        deleted = rows.delete_rows()
+        ResourceReportHistory.objects.bulk_create([
+            ResourceReportHistory(
+                facility_id=bucket["facility_id"],
+                timestamp=bucket["bucket"],
+                sample_count=bucket["samples"],
+                **{field: round(bucket[field] / bucket["samples"]) for field in RESOURCE_FIELDS},
+            )
+            for bucket in buckets
+        ])
+        counters.add({counters.HISTORY: len(buckets) - deleted})
+        caching.invalidate_trends(facility_ids, window[0])
+    return deleted - len(buckets)
+
+
+def downsample_history(retention_days, granularity="hourly", batch_size=5000, stdout=None):
+    """Downsample history older than ``retention_days``; returns rows removed"""
+    trunc = GRANULARITIES[granularity]
+    cutoff = _start_of_day(timezone.now() - timedelta(days=retention_days))
+    oldest = ResourceReportHistory.objects.filter(
+        timestamp__lt=cutoff).aggregate(oldest=Min("timestamp"))["oldest"]
+    if oldest is None:
+        return 0
+
+    removed = 0
+    day = _start_of_day(oldest)
+    while day < cutoff:
+        window = (day, day + timedelta(days=1))
+        # Facilities with more rows than buckets still hold raw snapshots
+        facilities = (
+            ResourceReportHistory.objects.filter(
+                timestamp__gte=window[0], timestamp__lt=window[1])
+            .values("facility_id")
+            .annotate(rows=Count("id"), buckets=Count(trunc("timestamp"), distinct=True))
+            .filter(rows__gt=F("buckets"))
+            .order_by("facility_id")
+        )
+
+        window_removed = 0
+        chunk, chunk_rows = [], 0
+        for facility in list(facilities):
+            chunk.append(facility["facility_id"])
+            chunk_rows += facility["rows"]
+            if chunk_rows >= batch_size:
+                window_removed += _compact(window, chunk, trunc)
+                chunk, chunk_rows = [], 0
+        if chunk:
+            window_removed += _compact(window, chunk, trunc)
+
+        if window_removed and stdout is not None:
+            stdout.write(f"{window[0]:%Y-%m-%d}: {window_removed} rows removed")
+        removed += window_removed
+        day = window[1]
+    return removed
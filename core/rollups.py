@@ -0,0 +1,157 @@
+"""
+Daily rollups of ResourceReportHistory.
+
+Every history write also folds its rows into ResourceReportDailyRollup: one
+row per facility and local day with the sample count and the sum, min and
+max of each metric. Trend queries read those few rows instead of every
+snapshot, so their cost follows the number of days, not the reporting
+frequency. ``rebuild_rollups`` recomputes them from history for backfills.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.utils import timezone
+
+from . import archive, caching
+from .models import RESOURCE_FIELDS, ResourceReportDailyRollup, ResourceReportHistory
+
+
+ROLLUP_FIELDS = ["sample_count"] + [
+    f"{field}_{part}" for field in RESOURCE_FIELDS for part in ("sum", "min", "max")
+]
+
+
+def day_bounds(day):
+    """Aware datetimes delimiting a local calendar day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _totals(rows):
+    """Fold history rows into {(facility_id, day): rollup values}"""
+    totals = {}
+    for row in rows:
+        key = (row.facility_id, timezone.localdate(row.timestamp))
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = {"sample_count": 0}
+            for field in RESOURCE_FIELDS:
+                total[f"{field}_sum"] = 0
+                total[f"{field}_min"] = total[f"{field}_max"] = getattr(row, field)
+        total["sample_count"] += row.sample_count
+        for field in RESOURCE_FIELDS:
+            value = getattr(row, field)
+            total[f"{field}_sum"] += value * row.sample_count
+            total[f"{field}_min"] = min(total[f"{field}_min"], value)
+            total[f"{field}_max"] = max(total[f"{field}_max"], value)
+    return totals
+
+
+def add_to_rollups(rows):
+    """Fold newly written history rows into their daily rollups.
+
+    Call inside the transaction that wrote ``rows``. Missing rollups are
+    inserted empty first so every affected row can be locked and merged;
+    concurrent writers then add to each other's totals instead of
+    overwriting them.
+    """
+    totals = _totals(rows)
+    if not totals:
+        return
+
+    ResourceReportDailyRollup.objects.bulk_create(
+        [
+            ResourceReportDailyRollup(
+                facility_id=facility_id,
+                day=day,
+                **{f"{field}_{part}": total[f"{field}_{part}"]
+                   for field in RESOURCE_FIELDS for part in ("min", "max")},
+            )
+            for (facility_id, day), total in totals.items()
+        ],
+        ignore_conflicts=True,
+    )
+    rollups = ResourceReportDailyRollup.objects.select_for_update().filter(
+        facility_id__in={facility_id for facility_id, _ in totals},
+        day__in={day for _, day in totals},
+    ).order_by("facility_id", "day")
+
+    merged = []
+    for rollup in rollups:
+        total = totals.get((rollup.facility_id, rollup.day))
+        if total is None:
+            continue
+        rollup.sample_count += total["sample_count"]
+        for field in RESOURCE_FIELDS:
+            setattr(rollup, f"{field}_sum",
+                    getattr(rollup, f"{field}_sum") + total[f"{field}_sum"])
+            setattr(rollup, f"{field}_min",
+                    min(getattr(rollup, f"{field}_min"), total[f"{field}_min"]))
+            setattr(rollup, f"{field}_max",
+                    max(getattr(rollup, f"{field}_max"), total[f"{field}_max"]))
+        merged.append(rollup)
+    ResourceReportDailyRollup.objects.bulk_update(merged, ROLLUP_FIELDS)
+
+
+def rebuild_rollups(days=None, batch_size=1000, stdout=None):
+    """Recompute rollups from history one day per transaction; returns days rebuilt.
+
+    ``days`` limits the rebuild to the most recent days. Days already
+    downsampled by the retention policy are rebuilt from the averaged rows,
+    so their min/max only cover those averages. Archived months keep their
+    rollups, since their rows are no longer in the database.
+    """
+    today = timezone.localdate()
+    if days is None:
+        oldest = ResourceReportHistory.objects.aggregate(
+            oldest=Min("timestamp"))["oldest"]
+        if oldest is None:
+            return 0
+        day = timezone.localdate(oldest)
+    else:
+        day = today - timedelta(days=days - 1)
+    archived_until = archive.horizon()
+    if archived_until is not None:
+        day = max(day, timezone.localdate(archived_until))
+
+    rebuilt = 0
+    while day <= today:
+        start, end = day_bounds(day)
+        with transaction.atomic():
+            totals = list(
+                ResourceReportHistory.objects.filter(
+                    timestamp__gte=start, timestamp__lt=end)
+                .values("facility_id")
+                .annotate(
+                    samples=Sum("sample_count"),
+                    **{f"{field}_sum": Sum(F(field) * F("sample_count"))
+                       for field in RESOURCE_FIELDS},
+                    **{f"{field}_min": Min(field) for field in RESOURCE_FIELDS},
+                    **{f"{field}_max": Max(field) for field in RESOURCE_FIELDS},
+                )
+                .order_by("facility_id")
+            )
+            ResourceReportDailyRollup.objects.filter(day=day).exclude(
+                facility_id__in=[total["facility_id"] for total in totals]).delete()
+            ResourceReportDailyRollup.objects.bulk_create(
+                [
+                    ResourceReportDailyRollup(
+                        facility_id=total.pop("facility_id"),
+                        day=day,
+                        sample_count=total.pop("samples"),
+                        **total,
+                    )
+                    for total in totals
+                ],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["facility", "day"],
+                update_fields=ROLLUP_FIELDS,
+            )
+            caching.invalidate(caching.trend_scope("all"), caching.PAST_TRENDS)
+        if totals and stdout is not None:
+            stdout.write(f"{day:%Y-%m-%d}: {len(totals)} facilities")
+        rebuilt += 1
+        day += timedelta(days=1)
+    return rebuilt
@@ -1,6 +1,22 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
 
-from .models import ResourceReport, User, Facility, SystemSetting
+from .models import Job, ResourceReport, User, Facility, SystemSetting
+from .settings_registry import get_settings
+
+
+class SparseFieldsMixin:
+    """Drop every field not listed in context["fields"] (None keeps all)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class ResourceReportSerializer(serializers.ModelSerializer):
@@ -21,9 +37,39 @@ class ResourceReportSerializer(serializers.ModelSerializer):
         return value
 
 
-class DashboardFacilityReportSerializer(serializers.ModelSerializer):
-    facility_id = serializers.IntegerField(
-        source="facility.id", read_only=True)
+class BulkResourceReportItemSerializer(ResourceReportSerializer):
+    """One facility's entry in a bulk report submission"""
+    facility_id = serializers.IntegerField()
+
+    class Meta(ResourceReportSerializer.Meta):
+        fields = ("facility_id",) + ResourceReportSerializer.Meta.fields
+
+
+class OfflineReadingSerializer(ResourceReportSerializer):
+    """A reading captured offline, stamped with the device's clock"""
+    # Device clocks may run slightly ahead of the server
+    MAX_FUTURE_SKEW = timedelta(minutes=5)
+
+    recorded_at = serializers.DateTimeField()
+
+    class Meta(ResourceReportSerializer.Meta):
+        fields = ResourceReportSerializer.Meta.fields + ("recorded_at",)
+
+    def validate_recorded_at(self, value):
+        now = timezone.now()
+        if value > now + self.MAX_FUTURE_SKEW:
+            raise serializers.ValidationError(
+                "Reading time is in the future.")
+        system_settings = self.context.get("system_settings") or get_settings()
+        max_age = system_settings.get_int("offline_backlog_max_age_hours")
+        if value < now - timedelta(hours=max_age):
+            raise serializers.ValidationError(
+                f"Readings older than {max_age} hours are not accepted.")
+        return value
+
+
+class DashboardFacilityReportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    facility_id = serializers.IntegerField(read_only=True)
     facility_name = serializers.CharField(
         source="facility.name", read_only=True)
     country = serializers.CharField(source="facility.country", read_only=True)
@@ -47,19 +93,21 @@ class DashboardFacilityReportSerializer(serializers.ModelSerializer):
 
     def get_status(self, obj):
         """Determine facility status based on configurable thresholds"""
-        from .models import SystemSetting
-
-        try:
-            # Get threshold from settings, default to 0 if not found
-            threshold_setting = SystemSetting.objects.filter(
-                key='critical_icu_beds_threshold'
-            ).first()
-            threshold = int(
-                threshold_setting.value) if threshold_setting else 5
-        except (ValueError, AttributeError):
-            threshold = 5
-
-        return "CRITICAL" if obj.icu_beds_available <= threshold else "OK"
+        # Querysets annotated with ResourceReport.objects.with_status()
+        # already carry the status computed by the database
+        annotated = getattr(obj, "status", None)
+        if annotated is not None:
+            return annotated
+
+        # Settings are resolved once per serialization, not once per row
+        system_settings = self.context.get("system_settings")
+        if system_settings is None:
+            system_settings = self.context["system_settings"] = get_settings()
+
+        for field, threshold in system_settings.thresholds.items():
+            if getattr(obj, field) <= threshold:
+                return "CRITICAL"
+        return "OK"
 
     def validate_ventilators_available(self, value):
         if value < 0:
@@ -145,7 +193,7 @@ class AdminCreateUserSerializer(serializers.Serializer):
         }
 
 
-class FacilitySerializer(serializers.ModelSerializer):
+class FacilitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Facility
         fields = (
@@ -156,7 +204,7 @@ class FacilitySerializer(serializers.ModelSerializer):
         )
 
 
-class AdminUserListSerializer(serializers.ModelSerializer):
+class AdminUserListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     facility = FacilitySerializer(read_only=True)
 
     class Meta:
@@ -221,6 +269,42 @@ class AdminUpdateUserSerializer(serializers.Serializer):
         return instance
 
 
+class AdminBulkUserActionSerializer(serializers.Serializer):
+    """Body of admin/users/actions/: one action applied to many users"""
+    ACTIONS = ("set_role", "set_facility", "delete")
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+    action = serializers.ChoiceField(choices=ACTIONS)
+    role = serializers.CharField(required=False)
+    facility_id = serializers.IntegerField(required=False)
+
+    def validate_role(self, value):
+        normalized = value.upper()
+        valid = {User.Role.REPORTER,
+                 User.Role.MONITOR, User.Role.ADMINISTRATOR}
+        if normalized not in valid:
+            raise serializers.ValidationError(
+                "Role must be one of: ADMIN, MONITOR, REPORTER.")
+        return normalized
+
+    def validate(self, attrs):
+        action = attrs["action"]
+        if action == "set_role" and not attrs.get("role"):
+            raise serializers.ValidationError({"role": "This field is required for set_role."})
+        if action == "set_facility" and attrs.get("facility_id") is None:
+            raise serializers.ValidationError(
+                {"facility_id": "This field is required for set_facility."})
+        if attrs.get("facility_id") is not None:
+            if not Facility.objects.filter(id=attrs["facility_id"]).exists():
+                raise serializers.ValidationError({"facility_id": "Facility not found."})
+            if action == "set_role" and attrs["role"] != User.Role.REPORTER:
+                raise serializers.ValidationError(
+                    {"facility_id": "Only reporters are assigned to a facility."})
+        attrs["ids"] = sorted(set(attrs["ids"]))
+        return attrs
+
+
 class SystemSettingSerializer(serializers.ModelSerializer):
     updated_by_username = serializers.CharField(
         source="updated_by.username", read_only=True, allow_null=True)
@@ -255,3 +339,26 @@ class SystemSettingUpdateSerializer(serializers.ModelSerializer):
         if not value or not value.strip():
             raise serializers.ValidationError("Value cannot be empty.")
         return value
+
+
+class JobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "kind",
+            "status",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "error",
+            "download_url",
+        )
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != Job.Status.SUCCEEDED:
+            return None
+        return reverse("job_download", args=[obj.pk])
@@ -0,0 +1,183 @@
+"""
+In-process registry of typed SystemSetting values.
+
+Every worker keeps the parsed THRESHOLD/ALERT/GENERAL settings in memory and
+only reloads them when the version stamp stored in ``SettingsVersion`` moves.
+Saving or deleting a SystemSetting calls ``invalidate()`` (see core.caching)
+so the other workers pick up the new values on their next request.
+"""
+import threading
+
+from django.db.models import F
+from django.utils import timezone
+
+
+DEFAULT_SETTINGS = [
+    {
+        "key": "critical_icu_beds_threshold",
+        "value": "5",
+        "description": "Minimum ICU beds before facility is marked CRITICAL",
+        "setting_type": "THRESHOLD"
+    },
+    {
+        "key": "critical_ventilators_threshold",
+        "value": "3",
+        "description": "Minimum ventilators before facility is marked CRITICAL",
+        "setting_type": "THRESHOLD"
+    },
+    {
+        "key": "critical_staff_threshold",
+        "value": "10",
+        "description": "Minimum staff on duty before facility is marked CRITICAL",
+        "setting_type": "THRESHOLD"
+    },
+    {
+        "key": "alert_notification_enabled",
+        "value": "true",
+        "description": "Enable or disable alert notifications",
+        "setting_type": "ALERT"
+    },
+    {
+        "key": "dashboard_refresh_interval",
+        "value": "60",
+        "description": "Dashboard auto-refresh interval in seconds",
+        "setting_type": "GENERAL"
+    },
+    {
+        "key": "offline_backlog_max_age_hours",
+        "value": "72",
+        "description": "Oldest offline reading (in hours) a reporter may upload",
+        "setting_type": "GENERAL"
+    },
+    {
+        "key": "history_retention_days",
+        "value": "30",
+        "description": "Days of raw history snapshots kept before downsampling",
+        "setting_type": "GENERAL"
+    },
+    {
+        "key": "history_downsample_granularity",
+        "value": "hourly",
+        "description": "Bucket size for downsampled history: hourly or daily",
+        "setting_type": "GENERAL"
+    },
+    {
+        "key": "history_hot_months",
+        "value": "6",
+        "description": "Whole months of history kept in the database before archiving",
+        "setting_type": "GENERAL"
+    },
+]
+
+# Resource field -> threshold setting that marks a facility CRITICAL
+THRESHOLD_KEYS = {
+    "icu_beds_available": "critical_icu_beds_threshold",
+    "ventilators_available": "critical_ventilators_threshold",
+    "staff_on_duty": "critical_staff_threshold",
+}
+
+
+def parse_value(raw):
+    """Convert a stored setting string into a bool, int or stripped string"""
+    value = (raw or "").strip()
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+DEFAULTS = {item["key"]: parse_value(item["value"]) for item in DEFAULT_SETTINGS}
+
+
+class SettingsSnapshot:
+    """Immutable view of the settings loaded for one version stamp"""
+
+    def __init__(self, version, last_updated, values, types):
+        self.version = version
+        self.last_updated = last_updated
+        self._values = values
+        self._types = types
+
+    def get(self, key, default=None):
+        if key in self._values:
+            return self._values[key]
+        return DEFAULTS.get(key, default)
+
+    def get_int(self, key):
+        """Integer setting, falling back to the default for unparseable values"""
+        value = self.get(key)
+        if isinstance(value, bool) or not isinstance(value, int):
+            return DEFAULTS.get(key)
+        return value
+
+    def of_type(self, setting_type):
+        return {
+            key: value for key, value in self._values.items()
+            if self._types.get(key) == setting_type
+        }
+
+    @property
+    def thresholds(self):
+        """Critical threshold per resource field"""
+        return {field: self.get_int(key) for field, key in THRESHOLD_KEYS.items()}
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def current_version():
+    """(version, last_updated) of the shared stamp; (0, None) before any change"""
+    from .models import SettingsVersion
+
+    stamp = SettingsVersion.objects.filter(pk=SettingsVersion.SINGLETON_ID).values_list(
+        "version", "last_updated").first()
+    return stamp or (0, None)
+
+
+def _load(version, last_updated):
+    from .models import SystemSetting
+
+    values = {}
+    types = {}
+    for key, value, setting_type in SystemSetting.objects.values_list("key", "value", "setting_type"):
+        values[key] = parse_value(value)
+        types[key] = setting_type
+    return SettingsSnapshot(version, last_updated, values, types)
+
+
+def get_settings():
+    """Return the current settings, reloading only if the DB version moved"""
+    global _snapshot
+
+    version, last_updated = current_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _load(version, last_updated)
+        return _snapshot
+
+
+def invalidate():
+    """Bump the shared version stamp and drop this worker's copy"""
+    global _snapshot
+    from .models import SettingsVersion
+
+    now = timezone.now()
+    updated = SettingsVersion.objects.filter(pk=SettingsVersion.SINGLETON_ID).update(
+        version=F("version") + 1, last_updated=now)
+    if not updated:
+        _, created = SettingsVersion.objects.get_or_create(
+            pk=SettingsVersion.SINGLETON_ID, defaults={"version": 1})
+        if not created:
+            SettingsVersion.objects.filter(pk=SettingsVersion.SINGLETON_ID).update(
+                version=F("version") + 1, last_updated=now)
+
+    with _lock:
+        _snapshot = None
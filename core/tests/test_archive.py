@@ -0,0 +1,53 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import archive, counters
+from ..models import Facility, ResourceReportHistory
+from ..views import MonitorExportHistoryView
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(HFRAT_ARCHIVE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.facility = Facility.objects.create(name="F", country="Kenya", city="C")
+        now = timezone.now()
+        for days_ago in (100, 99, 1):
+            ResourceReportHistory.objects.create(
+                facility=self.facility, timestamp=now - timedelta(days=days_ago),
+                icu_beds_available=days_ago, ventilators_available=1, staff_on_duty=1)
+
+    def exported(self, **params):
+        dataset = MonitorExportHistoryView.dataset(params)
+        return sorted(row[2] for row in dataset.rows)
+
+    def test_old_months_move_to_segments(self):
+        removed = archive.archive_history(hot_months=1)
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(ResourceReportHistory.objects.count(), 1)
+        self.assertEqual(
+            sorted(row["icu_beds_available"] for row in archive.iter_history()), [99, 100])
+        self.assertGreater(archive.horizon(), timezone.now() - timedelta(days=99))
+        self.assertEqual(counters.reconcile(), {})
+        self.assertEqual(self.exported(), [1, 99, 100])
+        self.assertEqual(self.exported(since=(timezone.now() - timedelta(days=10)).isoformat()), [1])
+
+    def test_interrupted_run_is_not_exported_twice(self):
+        with mock.patch.object(archive, "_delete", return_value=0):
+            archive.archive_history(hot_months=1)
+        self.assertEqual(ResourceReportHistory.objects.count(), 3)
+        self.assertEqual(self.exported(), [1, 99, 100])
+
+        # The next run deletes what the first one archived without rewriting it
+        self.assertEqual(archive.archive_history(hot_months=1), 2)
+        self.assertEqual(len(list(archive.iter_history())), 2)
+        self.assertEqual(self.exported(), [1, 99, 100])
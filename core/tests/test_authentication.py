@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..authentication import local_versions
+from ..models import User
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_versions.clear()
+        self.admin = User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR)
+        self.tokens = APIClient().post(
+            "/api/token/", {"username": "admin", "password": "x"}, format="json").json()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_role_change_revokes_tokens(self):
+        self.assertEqual(self.client.get("/api/admin/stats/").status_code, 200)
+
+        # Like an edit on the Django admin site: a plain save, no API call
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.role = User.Role.MONITOR
+            self.admin.save()
+
+        self.assertEqual(self.client.get("/api/admin/stats/").status_code, 401)
+        response = APIClient().post(
+            "/api/token/refresh/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_unrelated_save_keeps_tokens(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.first_name = "Ada"
+            self.admin.save()
+
+        self.assertEqual(self.client.get("/api/admin/stats/").status_code, 200)
+
+    def test_versions_are_kept_in_memory(self):
+        self.client.get("/api/health/")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/api/health/").status_code, 200)
+        self.assertEqual(len(queries), 0)
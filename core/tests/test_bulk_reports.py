@@ -0,0 +1,46 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .. import counters
+from ..models import Facility, ResourceReport, ResourceReportHistory, User
+
+
+class BulkReportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR))
+        self.reported, self.new = [
+            Facility.objects.create(name=f"F{i}", country="Kenya", city="C") for i in range(2)]
+        ResourceReport.objects.create(
+            facility=self.reported, icu_beds_available=1, ventilators_available=1, staff_on_duty=1)
+
+    def item(self, facility_id, beds=5):
+        return {"facility_id": facility_id, "icu_beds_available": beds,
+                "ventilators_available": 2, "staff_on_duty": 9}
+
+    def test_reports_are_upserted_and_errors_reported(self):
+        response = self.client.post("/api/admin/reports/bulk/", {"reports": [
+            self.item(self.reported.id, 7),
+            self.item(self.new.id),
+            self.item(self.new.id),
+            self.item(999999),
+            {"facility_id": self.new.id, "icu_beds_available": -1},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["saved"], body["failed"]), (2, 3))
+        self.assertEqual([result["status"] for result in body["results"]],
+                         ["ok", "ok", "error", "error", "error"])
+        self.assertIn("more than once", body["results"][2]["errors"]["facility_id"][0])
+        self.assertEqual(ResourceReport.objects.get(facility=self.reported).icu_beds_available, 7)
+        self.assertEqual(ResourceReport.objects.count(), 2)
+        self.assertEqual(ResourceReportHistory.objects.count(), 2)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_batch_size_is_limited(self):
+        response = self.client.post(
+            "/api/admin/reports/bulk/", [self.item(self.new.id)] * 1001, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ResourceReport.objects.filter(facility=self.new).exists())
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import caching
+from ..models import Facility, ResourceReport, User
+
+
+# Cache entries are invalidated when writes commit
+class ResponseCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.facilities = [
+            Facility.objects.create(name=f"F{i}", country="Kenya", city="C") for i in range(2)]
+        for facility in self.facilities:
+            ResourceReport.objects.create(
+                facility=facility, icu_beds_available=4, ventilators_available=2, staff_on_duty=9)
+        self.monitor = APIClient()
+        self.monitor.force_authenticate(
+            User.objects.create_user("mon", password="x", role=User.Role.MONITOR))
+        self.reporter = APIClient()
+        self.reporter.force_authenticate(User.objects.create_user(
+            "rep", password="x", role=User.Role.REPORTER, facility=self.facilities[0]))
+        self.admin = APIClient()
+        self.admin.force_authenticate(
+            User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR))
+
+    def get(self, client, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def submit(self, beds):
+        response = self.reporter.post("/api/reporter/report/", {
+            "icu_beds_available": beds, "ventilators_available": 2, "staff_on_duty": 9,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def beds(self, dashboard):
+        return {row["facility_id"]: row["icu_beds_available"] for row in dashboard}
+
+    def test_dashboard_is_served_from_cache(self):
+        first, first_queries = self.get(self.monitor, "/api/monitor/dashboard/")
+        again, queries = self.get(self.monitor, "/api/monitor/dashboard/")
+        self.assertEqual(again, first)
+        self.assertLess(queries, first_queries)
+
+    def test_report_invalidates_dashboard_and_stats(self):
+        self.get(self.monitor, "/api/monitor/dashboard/")
+        self.get(self.admin, "/api/admin/stats/")
+        self.submit(40)
+
+        dashboard, _ = self.get(self.monitor, "/api/monitor/dashboard/")
+        self.assertEqual(self.beds(dashboard)[self.facilities[0].id], 40)
+        stats, _ = self.get(self.admin, "/api/admin/stats/")
+        self.assertEqual(stats["resources"]["total_beds"], 44)
+
+    def test_report_keeps_other_trends_cached(self):
+        other = f"/api/monitor/trend/?facility_id={self.facilities[1].id}"
+        _, uncached = self.get(self.monitor, other)
+        own = f"/api/monitor/trend/?facility_id={self.facilities[0].id}"
+        before, _ = self.get(self.monitor, own)
+        self.submit(40)
+
+        after, _ = self.get(self.monitor, own)
+        self.assertNotEqual(after["data"], before["data"])
+        _, queries = self.get(self.monitor, other)
+        self.assertLess(queries, uncached)
+
+    def test_user_write_invalidates_stats(self):
+        stats, _ = self.get(self.admin, "/api/admin/stats/")
+        User.objects.create_user("mon2", password="x", role=User.Role.MONITOR)
+
+        after, _ = self.get(self.admin, "/api/admin/stats/")
+        self.assertEqual(
+            after["overview"]["total_users"], stats["overview"]["total_users"] + 1)
+
+    def test_rolled_back_write_does_not_invalidate(self):
+        before = caching.generations(caching.REPORTS)
+        try:
+            with transaction.atomic():
+                caching.invalidate(caching.REPORTS)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(caching.generations(caching.REPORTS), before)
+
+        with transaction.atomic():
+            caching.invalidate(caching.REPORTS)
+        self.assertNotEqual(caching.generations(caching.REPORTS), before)
+
+    def test_backlog_invalidates_past_days(self):
+        path = f"/api/monitor/trend/?facility_id={self.facilities[0].id}&window=7d"
+        before, _ = self.get(self.monitor, path)
+        recorded_at = (timezone.now() - timedelta(days=2)).isoformat()
+        response = self.reporter.post("/api/reporter/report/backlog/", [{
+            "icu_beds_available": 1, "ventilators_available": 1, "staff_on_duty": 1,
+            "recorded_at": recorded_at,
+        }], format="json")
+        self.assertEqual(response.json()["saved"], 1)
+
+        after, _ = self.get(self.monitor, path)
+        self.assertEqual(len(after["data"]), len(before["data"]) + 1)
+
+
+class ComputeOnceTests(TransactionTestCase):
+    def test_cached_value_is_computed_once(self):
+        cache.clear()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        self.assertEqual(caching.get_or_compute("hfrat:test", compute, 60), 42)
+        self.assertEqual(caching.get_or_compute("hfrat:test", compute, 60), 42)
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from ..models import Facility, ResourceReport, User
+
+
+# Cache entries are invalidated when writes commit
+class DashboardConditionalTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        monitor = User.objects.create_user("mon", password="x", role=User.Role.MONITOR)
+        self.facility = Facility.objects.create(name="F", country="Kenya", city="C")
+        self.report = ResourceReport.objects.create(
+            facility=self.facility, icu_beds_available=4, ventilators_available=2, staff_on_duty=9)
+        self.client = APIClient()
+        self.client.force_authenticate(monitor)
+
+    def get(self, etag, path="/api/monitor/dashboard/", **params):
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_poll_is_not_modified(self):
+        response = self.client.get("/api/monitor/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+
+        again = self.get(response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], response["ETag"])
+
+    def test_query_string_has_its_own_etag(self):
+        etag = self.client.get("/api/monitor/dashboard/")["ETag"]
+        self.assertEqual(self.get(etag, status="OK").status_code, 200)
+
+    def test_rename_changes_etag(self):
+        etag = self.client.get("/api/monitor/dashboard/")["ETag"]
+        self.facility.name = "Renamed"
+        self.facility.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["facility_name"], "Renamed")
+
+    def test_report_delete_changes_etag(self):
+        etag = self.client.get("/api/monitor/dashboard/")["ETag"]
+        self.report.delete()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_trend_is_not_modified(self):
+        path = f"/api/monitor/trend/?facility_id={self.facility.id}"
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(response["ETag"], path).status_code, 304)
+
+
+class SettingsConditionalTests(TransactionTestCase):
+    def test_settings_keep_last_modified(self):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("mon", password="x", role=User.Role.MONITOR))
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR))
+        admin.post("/api/admin/settings/initialize/")
+
+        response = client.get("/api/settings/public/")
+        self.assertIn("Last-Modified", response)
+        again = client.get("/api/settings/public/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
@@ -0,0 +1,84 @@
+from django.test import TestCase
+
+from .. import counters
+from ..models import Facility, ResourceReport, ResourceReportHistory, User
+
+
+class CounterReconcileTests(TestCase):
+    def setUp(self):
+        User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR)
+        Facility.objects.create(name="F", country="Kenya", city="C")
+
+    def test_reconcile_corrects_drift(self):
+        counters.reconcile()
+        counters.add({counters.FACILITIES: 3, counters.USERS: -1})
+
+        self.assertEqual(counters.reconcile(), {counters.FACILITIES: -3, counters.USERS: 1})
+        self.assertEqual(counters.snapshot()[counters.FACILITIES], 1)
+        self.assertEqual(counters.snapshot()[counters.USERS], 1)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_reconcile_counts_bulk_writes(self):
+        # bulk_create sends no signals, so nothing was counted
+        facility = Facility.objects.get()
+        ResourceReport.objects.bulk_create([ResourceReport(
+            facility=facility, icu_beds_available=4, ventilators_available=2, staff_on_duty=9)])
+        counters.reconcile()
+
+        snapshot = counters.snapshot()
+        self.assertEqual(snapshot[counters.REPORTS], 1)
+        self.assertEqual(snapshot[counters.resource_counter("icu_beds_available")], 4)
+
+
+class CounterSignalTests(TestCase):
+    """Single-row writes outside core.reporting, as from the Django admin"""
+
+    def setUp(self):
+        self.facilities = [
+            Facility.objects.create(name=f"F{i}", country="Kenya", city="C") for i in range(5)]
+
+    def create_report(self, facility, beds=4):
+        return ResourceReport.objects.create(
+            facility=facility, icu_beds_available=beds, ventilators_available=2, staff_on_duty=9)
+
+    def test_report_saves_and_deletes(self):
+        reports = [self.create_report(facility) for facility in self.facilities]
+        self.assertEqual(counters.snapshot()[counters.REPORTS], 5)
+
+        reports[0].icu_beds_available = 10
+        reports[0].save()
+        reports[1].delete()
+
+        snapshot = counters.snapshot()
+        self.assertEqual(snapshot[counters.REPORTS], 4)
+        self.assertEqual(snapshot[counters.resource_counter("icu_beds_available")], 22)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_history_creates_and_deletes(self):
+        rows = [ResourceReportHistory.objects.create(
+            facility=self.facilities[0], icu_beds_available=1, ventilators_available=1,
+            staff_on_duty=1) for _ in range(3)]
+        rows[0].delete()
+
+        self.assertEqual(counters.snapshot()[counters.HISTORY], 2)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_facility_delete_cascades(self):
+        self.create_report(self.facilities[0])
+        for _ in range(3):
+            ResourceReportHistory.objects.create(
+                facility=self.facilities[0], icu_beds_available=1, ventilators_available=1,
+                staff_on_duty=1)
+        self.facilities[0].delete()
+
+        self.assertEqual(counters.reconcile(), {})
+        self.assertNotIn(counters.HISTORY, counters.snapshot())
+
+    def test_bulk_delete_rows_sends_no_signals(self):
+        for _ in range(3):
+            ResourceReportHistory.objects.create(
+                facility=self.facilities[0], icu_beds_available=1, ventilators_available=1,
+                staff_on_duty=1)
+        self.assertEqual(ResourceReportHistory.objects.all().delete_rows(), 3)
+
+        self.assertEqual(counters.reconcile(), {counters.HISTORY: -3})
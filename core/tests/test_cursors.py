@@ -0,0 +1,57 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ..cursors import encode_cursor
+from ..models import Facility, ResourceReport, User
+
+
+class CursorValidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        monitor = User.objects.create_user("mon", password="x", role=User.Role.MONITOR)
+        for name in ("A", "B", "C"):
+            facility = Facility.objects.create(name=name, country="Kenya", city="C")
+            ResourceReport.objects.create(
+                facility=facility, icu_beds_available=4, ventilators_available=2, staff_on_duty=9)
+        self.client = APIClient()
+        self.client.force_authenticate(monitor)
+
+    def test_changes_cursor_round_trip(self):
+        cursor = self.client.get("/api/monitor/dashboard/changes/").json()["cursor"]
+        response = self.client.get("/api/monitor/dashboard/changes/", {"since": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["changes"], [])
+
+    def test_unsigned_cursor_is_rejected(self):
+        forged = base64.urlsafe_b64encode(json.dumps({
+            "t": "2020-01-01T00:00:00+00:00",
+            "th": {"facility__users__password__startswith": "pbkdf2"},
+        }).encode()).decode()
+        response = self.client.get("/api/monitor/dashboard/changes/", {"since": forged})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tampered_cursor_is_rejected(self):
+        cursor = self.client.get("/api/monitor/dashboard/changes/").json()["cursor"]
+        response = self.client.get("/api/monitor/dashboard/changes/", {"since": cursor[:-2] + "xx"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_threshold_is_rejected(self):
+        cursor = encode_cursor({
+            "t": "2020-01-01T00:00:00+00:00", "th": {"facility__users__password": 1}})
+        response = self.client.get("/api/monitor/dashboard/changes/", {"since": cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_cursor(self):
+        page = self.client.get("/api/monitor/dashboard/", {"limit": 2}).json()
+        response = self.client.get("/api/monitor/dashboard/", {"limit": 2, "cursor": page["next"]})
+        self.assertEqual([row["facility_name"] for row in response.json()["results"]], ["C"])
+
+        response = self.client.get(
+            "/api/monitor/dashboard/", {"order": "-facility_name", "cursor": page["next"]})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/monitor/dashboard/", {"cursor": "abc"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import idempotency
+from ..models import Facility, IdempotencyKey, ResourceReport, ResourceReportHistory, User
+
+
+class IdempotentReportTests(TestCase):
+    body = {"icu_beds_available": 4, "ventilators_available": 2, "staff_on_duty": 9}
+
+    def setUp(self):
+        facility = Facility.objects.create(name="F", country="Kenya", city="C")
+        reporter = User.objects.create_user(
+            "rep", password="x", role=User.Role.REPORTER, facility=facility)
+        self.client = APIClient()
+        self.client.force_authenticate(reporter)
+
+    def post(self, body, key):
+        return self.client.post(
+            "/api/reporter/report/", body, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(self.body, "abc")
+        retry = self.post(self.body, "abc")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(ResourceReportHistory.objects.count(), 1)
+
+    def test_key_reused_for_another_body(self):
+        self.post(self.body, "abc")
+        response = self.post(dict(self.body, icu_beds_available=7), "abc")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ResourceReport.objects.get().icu_beds_available, 4)
+
+    def test_expired_key_is_reused(self):
+        self.post(self.body, "abc")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        response = self.post(dict(self.body, icu_beds_available=7), "abc")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_concurrent_retry_is_replayed(self):
+        # The retry stores the key after this request found none
+        first = self.post(self.body, "abc")
+        with mock.patch.object(idempotency, "_stored", side_effect=[
+                None, IdempotencyKey.objects.get()]):
+            response = self.post(self.body, "abc")
+
+        self.assertEqual(response.json(), first.json())
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(ResourceReportHistory.objects.count(), 1)
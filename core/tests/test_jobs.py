@@ -0,0 +1,75 @@
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job, User
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(JOB_OUTPUT_DIR=directory.name, JOB_TIMEOUT_MINUTES=10)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR)
+
+    def enqueue(self):
+        return jobs.enqueue(Job.Kind.USERS_EXPORT, self.admin.id, {"format": "csv"})
+
+    def test_claimed_job_runs_to_a_file(self):
+        queued = self.enqueue()
+        job = jobs.claim()
+        self.assertEqual((job.pk, job.status, job.attempts), (queued.pk, Job.Status.RUNNING, 1))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(jobs.claim())
+
+        jobs.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+        self.assertIn("admin", jobs.result_file(job).read_text())
+
+    def age(self, job, minutes):
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(minutes=minutes))
+
+    def test_long_job_with_heartbeat_is_not_requeued(self):
+        self.enqueue()
+        job = jobs.claim()
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=5))
+        self.assertTrue(jobs.heartbeat(job))
+        self.assertEqual(jobs.requeue_stale(), (0, 0))
+
+    def test_silent_job_is_requeued_then_failed(self):
+        self.enqueue()
+        for attempt in range(1, jobs.MAX_ATTEMPTS + 1):
+            job = jobs.claim()
+            self.assertEqual(job.attempts, attempt)
+            self.age(job, 11)
+            if attempt < jobs.MAX_ATTEMPTS:
+                self.assertEqual(jobs.requeue_stale(), (1, 0))
+                # The stopped run can no longer claim the job back
+                self.assertFalse(jobs.heartbeat(job))
+        self.assertEqual(jobs.requeue_stale(), (0, 1))
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_worker_beats_while_the_job_runs(self):
+        self.enqueue()
+        job = jobs.claim()
+        beats = threading.Semaphore(0)
+
+        def export(job):
+            # Fails the job unless a heartbeat arrives while it runs
+            if not beats.acquire(timeout=5):
+                raise AssertionError("no heartbeat")
+
+        with mock.patch.object(jobs, "HEARTBEAT_INTERVAL", 0.01), \
+                mock.patch.object(jobs, "heartbeat", side_effect=lambda job: beats.release()), \
+                mock.patch.object(jobs, "_run_export", side_effect=export):
+            jobs.run(job)
+        self.assertEqual(Job.objects.get().status, Job.Status.SUCCEEDED)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .. import counters, provisioning
+from ..models import Facility, User
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class BulkCreateUsersTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR))
+        User.objects.create_user("taken", password="x", role=User.Role.MONITOR)
+
+    def test_valid_rows_are_created_and_errors_reported(self):
+        rows = [
+            {"username": "r1", "password": "secret1", "role": "REPORTER",
+             "hospital_name": "New", "country": "Kenya", "city": "Nairobi"},
+            {"username": "r2", "password": "secret2", "role": "REPORTER",
+             "hospital_name": "New", "country": "Kenya", "city": "Nairobi"},
+            {"username": "taken", "password": "secret3", "role": "MONITOR"},
+            {"username": "m1", "password": "short", "role": "MONITOR"},
+        ]
+        with mock.patch.object(provisioning, "ProcessPoolExecutor") as pool:
+            response = self.client.post("/api/admin/users/bulk/", {"users": rows}, format="json")
+        # Hashed in the request's own process
+        pool.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 2)
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["ok", "ok", "error", "error"])
+        r1 = User.objects.get(username="r1")
+        self.assertTrue(r1.check_password("secret1"))
+        self.assertEqual(r1.facility_id, User.objects.get(username="r2").facility_id)
+        self.assertEqual(Facility.objects.count(), 1)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_csv_body(self):
+        body = "username,password,role,hospital_name,country,city\nc1,secret1,MONITOR,,,\n"
+        response = self.client.generic(
+            "POST", "/api/admin/users/bulk/", body, content_type="text/csv")
+        self.assertEqual(response.json()["created"], 1)
+
+    def test_batch_size_is_limited(self):
+        rows = [{"username": f"u{i}", "password": "secret1", "role": "MONITOR"}
+                for i in range(101)]
+        response = self.client.post("/api/admin/users/bulk/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username="u0").exists())
+
+
+class FacilityImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR))
+        Facility.objects.create(name="Known", country="Kenya", city="Nairobi")
+
+    def post(self, body):
+        return self.client.generic(
+            "POST", "/api/admin/facilities/import/", body, content_type="text/csv")
+
+    def test_rows_are_imported_in_batches(self):
+        body = ("﻿name,country,city\n"
+                "Known,Kenya,Nairobi\nNew,Kenya,Nairobi\nNew,Kenya,Nairobi\n,Kenya,Mombasa\n")
+        with mock.patch.object(provisioning, "BATCH_SIZE", 1):
+            response = self.post(body.encode("utf-8"))
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary["created"], summary["existing"], summary["failed"]), (1, 2, 1))
+        self.assertEqual(summary["errors"][0]["line"], 5)
+        self.assertEqual(Facility.objects.count(), 2)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_empty_body_imports_nothing(self):
+        response = self.post(b"")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 0)
+
+    def test_non_utf8_body_is_rejected(self):
+        response = self.post("name,country,city\nSão Tomé,Kenya,Nairobi\n".encode("latin-1"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Facility.objects.count(), 1)
+
+    def test_non_utf8_upload_of_users_is_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile("users.csv", "username\nJosé\n".encode("latin-1"))
+        response = self.client.post("/api/admin/users/bulk/", {"file": upload})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.db.models.functions import TruncHour
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import counters, retention
+from ..models import Facility, ResourceReportHistory
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.facility = Facility.objects.create(name="F", country="Kenya", city="C")
+        self.hour = (timezone.now() - timedelta(days=10)).replace(minute=0, second=0, microsecond=0)
+        for minute, beds in ((5, 2), (20, 4), (40, 9)):
+            self.history(self.hour + timedelta(minutes=minute), beds)
+        self.recent = self.history(timezone.now() - timedelta(hours=1), 7)
+
+    def history(self, timestamp, beds):
+        return ResourceReportHistory.objects.create(
+            facility=self.facility, timestamp=timestamp,
+            icu_beds_available=beds, ventilators_available=1, staff_on_duty=3)
+
+    def test_old_snapshots_become_hourly_averages(self):
+        self.assertEqual(retention.downsample_history(retention_days=7), 2)
+
+        old = ResourceReportHistory.objects.get(timestamp__lt=self.recent.timestamp)
+        self.assertEqual(old.timestamp, self.hour)
+        self.assertEqual((old.sample_count, old.icu_beds_available), (3, 5))
+        self.assertTrue(ResourceReportHistory.objects.filter(id=self.recent.id).exists())
+        self.assertEqual(counters.reconcile(), {})
+        # Already compacted
+        self.assertEqual(retention.downsample_history(retention_days=7), 0)
+
+    def test_rows_inserted_during_compaction_are_kept(self):
+        inserted = []
+
+        def trunc(expression):
+            # A backlog entry committed between the id bound and the aggregate
+            inserted.append(self.history(self.hour + timedelta(minutes=50), 100))
+            return TruncHour(expression)
+
+        window = (self.hour, self.hour + timedelta(days=1))
+        self.assertEqual(retention._compact(window, [self.facility.id], trunc), 2)
+
+        average = ResourceReportHistory.objects.get(timestamp=self.hour)
+        self.assertEqual((average.sample_count, average.icu_beds_available), (3, 5))
+        self.assertTrue(ResourceReportHistory.objects.filter(id=inserted[0].id).exists())
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import rollups
+from ..models import Facility, ResourceReportDailyRollup, ResourceReportHistory
+from ..reporting import submit_report
+
+backfill = import_module("core.migrations.0018_backfill_daily_rollups")
+
+
+def rollup_values(facility):
+    return list(ResourceReportDailyRollup.objects.filter(facility=facility)
+                .order_by("day").values("day", *rollups.ROLLUP_FIELDS))
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.facility = Facility.objects.create(name="F", country="Kenya", city="C")
+
+    def test_reports_fold_into_the_day(self):
+        for beds in (4, 10):
+            submit_report(self.facility, {
+                "icu_beds_available": beds, "ventilators_available": 2, "staff_on_duty": 9})
+
+        rollup = ResourceReportDailyRollup.objects.get(facility=self.facility)
+        self.assertEqual(rollup.day, timezone.localdate())
+        self.assertEqual(rollup.sample_count, 2)
+        self.assertEqual(
+            (rollup.icu_beds_available_sum, rollup.icu_beds_available_min,
+             rollup.icu_beds_available_max), (14, 4, 10))
+
+    def history(self, days_ago, beds, sample_count=1):
+        ResourceReportHistory.objects.create(
+            facility=self.facility, timestamp=timezone.now() - timedelta(days=days_ago),
+            icu_beds_available=beds, ventilators_available=1, staff_on_duty=1,
+            sample_count=sample_count)
+
+    def test_rebuild_matches_history(self):
+        self.history(3, 5)
+        self.history(3, 7, sample_count=3)
+        self.history(1, 2)
+        self.assertFalse(ResourceReportDailyRollup.objects.exists())
+
+        self.assertEqual(rollups.rebuild_rollups(), 4)
+        values = rollup_values(self.facility)
+        self.assertEqual([value["sample_count"] for value in values], [4, 1])
+        self.assertEqual(values[0]["icu_beds_available_sum"], 26)
+
+    def test_migration_backfills_history(self):
+        self.history(3, 5)
+        self.history(3, 7, sample_count=3)
+        self.history(1, 2)
+        # A rollup already written since the table was created
+        ResourceReportDailyRollup.objects.create(
+            facility=self.facility, day=timezone.localdate() - timedelta(days=1),
+            sample_count=1, icu_beds_available_sum=2, icu_beds_available_min=2,
+            icu_beds_available_max=2, ventilators_available_min=1,
+            ventilators_available_max=1, staff_on_duty_min=1, staff_on_duty_max=1)
+
+        backfill.backfill_rollups(apps, None)
+        backfilled = rollup_values(self.facility)
+        rollups.rebuild_rollups()
+        self.assertEqual(backfilled, rollup_values(self.facility))
+        self.assertEqual(len(backfilled), 2)
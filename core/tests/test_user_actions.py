@@ -0,0 +1,68 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .. import counters
+from ..models import Facility, User
+
+
+class BulkUserActionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="x", role=User.Role.ADMINISTRATOR)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.facility, self.other = [
+            Facility.objects.create(name=f"F{i}", country="Kenya", city="C") for i in range(2)]
+        self.reporters = [
+            User.objects.create_user(f"rep{i}", password="x", role=User.Role.REPORTER,
+                                     facility=self.facility) for i in range(2)]
+        self.monitor = User.objects.create_user("mon", password="x", role=User.Role.MONITOR)
+
+    def act(self, **body):
+        return self.client.post("/api/admin/users/actions/", body, format="json")
+
+    def ids(self, users):
+        return [user.id for user in users]
+
+    def test_set_role_clears_facility_and_revokes_tokens(self):
+        versions = {user.id: user.token_version for user in self.reporters}
+        response = self.act(action="set_role", role="monitor",
+                            ids=self.ids(self.reporters) + [999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["updated"], response.json()["not_found"]), (2, [999999]))
+        for user in User.objects.filter(id__in=versions):
+            self.assertEqual((user.role, user.facility_id), (User.Role.MONITOR, None))
+            self.assertEqual(user.token_version, versions[user.id] + 1)
+        self.assertEqual(counters.reconcile(), {})
+
+    def test_reporter_role_needs_a_facility(self):
+        response = self.act(action="set_role", role="REPORTER", ids=[self.monitor.id])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["ids"], [self.monitor.id])
+
+        response = self.act(action="set_role", role="REPORTER",
+                            facility_id=self.other.id, ids=[self.monitor.id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(id=self.monitor.id).facility_id, self.other.id)
+
+    def test_only_reporters_change_facility(self):
+        response = self.act(action="set_facility", facility_id=self.other.id,
+                            ids=self.ids(self.reporters) + [self.monitor.id])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["ids"], [self.monitor.id])
+        self.assertFalse(User.objects.filter(facility=self.other).exists())
+
+        response = self.act(action="set_facility", facility_id=self.other.id,
+                            ids=self.ids(self.reporters))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.filter(facility=self.other).count(), 2)
+
+    def test_delete(self):
+        response = self.act(action="delete", ids=[self.admin.id, self.monitor.id])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(User.objects.filter(id=self.monitor.id).exists())
+
+        response = self.act(action="delete", ids=self.ids(self.reporters) + [self.monitor.id])
+        self.assertEqual(response.json()["deleted"], 3)
+        self.assertEqual(list(User.objects.values_list("username", flat=True)), ["admin"])
+        self.assertEqual(counters.reconcile(), {})
@@ -0,0 +1,221 @@
+"""
+Trend series for the monitor trend endpoint.
+
+Each point is a bucket's sample-weighted average, bucketed by the database
+in a single query grouped by (facility, bucket). Daily and weekly series
+are read from ResourceReportDailyRollup, so a 90-day window costs about as
+much as a 7-day one; hourly series come from the raw history. For several
+facilities the response is streamed one facility at a time and ends with an
+``aggregate`` series that adds up every facility's averages, i.e. the
+fleet's total capacity per bucket. A single facility's past days are
+cached (``facility_buckets``).
+"""
+import json
+import math
+import re
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncHour, TruncWeek
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import caching
+from .models import (
+    RESOURCE_FIELDS,
+    ResourceReportDailyRollup,
+    ResourceReportHistory,
+)
+from .rollups import day_bounds
+
+
+# Response keys for each averaged column
+TREND_KEYS = {
+    "icu_beds": "icu_beds_available",
+    "ventilators": "ventilators_available",
+    "staff": "staff_on_duty",
+}
+
+GRANULARITIES = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+WINDOW_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+DEFAULT_WINDOW = "7d"
+DEFAULT_GRANULARITY = "daily"
+# Upper bound on points per series, e.g. a year of days or 15 days of hours
+MAX_BUCKETS = 366
+
+# Rows fetched from the database per round trip while streaming
+STREAM_CHUNK_SIZE = 2000
+
+# Past days of a facility's series are cached this long; they are
+# invalidated explicitly when they change
+PAST_CHUNK_SECONDS = 7 * 24 * 3600
+
+
+def parse_window(params):
+    """(granularity, since) from ?window= and ?granularity=.
+
+    ``window`` is a count and unit such as ``24h``, ``7d`` or ``12w``. The
+    bucket containing the window's start is included whole.
+    """
+    granularity = params.get("granularity", DEFAULT_GRANULARITY)
+    step = GRANULARITIES.get(granularity)
+    if step is None:
+        raise ValidationError(
+            {"granularity": f"Must be one of: {', '.join(GRANULARITIES)}."})
+
+    match = re.fullmatch(r"(\d+)([hdw])", params.get("window", DEFAULT_WINDOW))
+    if not match or int(match[1]) < 1:
+        raise ValidationError(
+            {"window": "Must be a positive number followed by h, d or w, e.g. 24h or 90d."})
+    window = timedelta(**{WINDOW_UNITS[match[2]]: int(match[1])})
+    if math.ceil(window / step) + 1 > MAX_BUCKETS:
+        raise ValidationError(
+            {"window": f"Too long for {granularity} buckets; at most {MAX_BUCKETS} points are returned."})
+
+    start = timezone.localtime() - window
+    if granularity == "hourly":
+        return granularity, start.replace(minute=0, second=0, microsecond=0)
+    day = start.date()
+    if granularity == "weekly":
+        day -= timedelta(days=day.weekday())
+    return granularity, day
+
+
+def trend_rows(facilities, granularity, since, until=None):
+    """Per-facility, per-bucket totals in [since, until), ordered by facility and bucket"""
+    if granularity == "hourly":
+        queryset = ResourceReportHistory.objects.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        bucket = TruncHour("timestamp")
+        totals = {f"{field}_total": Sum(F(field) * F("sample_count"))
+                  for field in RESOURCE_FIELDS}
+    else:
+        queryset = ResourceReportDailyRollup.objects.filter(
+            day__gte=since, sample_count__gt=0)
+        if until is not None:
+            queryset = queryset.filter(day__lt=until)
+        bucket = F("day") if granularity == "daily" else TruncWeek("day")
+        totals = {f"{field}_total": Sum(f"{field}_sum")
+                  for field in RESOURCE_FIELDS}
+    return (
+        queryset.filter(facility__in=facilities)
+        .values("facility_id", "facility__name", "facility__city",
+                "facility__country", bucket=bucket)
+        .annotate(samples=Sum("sample_count"), **totals)
+        .order_by("facility_id", "bucket")
+    )
+
+
+def trend_buckets(facilities, granularity, since, until=None):
+    """trend_rows as an iterator.
+
+    Hourly windows span at most MAX_BUCKETS hours and archiving keeps at
+    least a whole month in the database, so every bucket comes from there.
+    """
+    return trend_rows(facilities, granularity, since, until).iterator(
+        chunk_size=STREAM_CHUNK_SIZE)
+
+
+def _chunk_start(day, granularity):
+    """Where a cached chunk starts, as compared with its buckets"""
+    return day_bounds(day)[0] if granularity == "hourly" else day
+
+
+def facility_buckets(facility_id, granularity, since):
+    """trend_buckets for one facility, with the buckets before today cached.
+
+    Past buckets only change when history is backfilled or compacted, which
+    bumps their cache scopes, so they are cached a day (a week for weekly
+    series) at a time and only the current day or week is queried.
+    """
+    today = timezone.localdate()
+    if granularity == "weekly":
+        current, step = today - timedelta(days=today.weekday()), timedelta(weeks=1)
+    else:
+        current, step = today, timedelta(days=1)
+    chunks = []
+    day = timezone.localdate(since) if isinstance(since, datetime) else since
+    while day < current:
+        chunks.append(day)
+        day += step
+
+    def compute(missing):
+        computed = {chunk: [] for chunk in missing}
+        for row in trend_buckets(
+                [facility_id], granularity,
+                _chunk_start(missing[0], granularity),
+                _chunk_start(missing[-1] + step, granularity)):
+            bucket = row["bucket"]
+            chunk = timezone.localdate(bucket) if isinstance(bucket, datetime) else bucket
+            if chunk in computed:
+                computed[chunk].append({
+                    key: row[key] for key in
+                    ["bucket", "samples", *(f"{field}_total" for field in RESOURCE_FIELDS)]
+                })
+        return computed
+
+    past = caching.fetch_chunks(
+        ("trend-chunk", facility_id, granularity), chunks,
+        [caching.PAST_TRENDS, caching.past_trend_scope(facility_id)],
+        compute, PAST_CHUNK_SECONDS)
+    rows = [row for chunk in chunks for row in past[chunk] if row["bucket"] >= since]
+    rows.extend(trend_buckets(
+        [facility_id], granularity, max(since, _chunk_start(current, granularity))))
+    return rows
+
+
+def averages(row):
+    return {key: row[f"{field}_total"] / row["samples"]
+            for key, field in TREND_KEYS.items()}
+
+
+def point(bucket, values):
+    """Hourly buckets are labelled with a timestamp, others with their first day"""
+    if isinstance(bucket, datetime):
+        label = timezone.localtime(bucket).isoformat()
+    else:
+        label = bucket.strftime("%Y-%m-%d")
+    return {"date": label, **{key: round(value, 1) for key, value in values.items()}}
+
+
+def facility_series(rows):
+    """Series for one facility's consecutive rows"""
+    first = rows[0]
+    return {
+        "facility_id": first["facility_id"],
+        "facility_name": first["facility__name"],
+        "city": first["facility__city"],
+        "country": first["facility__country"],
+        "data": [point(row["bucket"], averages(row)) for row in rows],
+    }
+
+
+def stream_trends(rows):
+    """Yield the JSON body for a multi-facility trend piece by piece"""
+    totals = {}
+    yield '{"facilities": ['
+    separator = ""
+    for _, group in groupby(rows, key=itemgetter("facility_id")):
+        group = list(group)
+        yield separator + json.dumps(facility_series(group))
+        separator = ","
+        for row in group:
+            total = totals.setdefault(
+                row["bucket"], dict.fromkeys(["facilities", *TREND_KEYS], 0))
+            total["facilities"] += 1
+            for key, value in averages(row).items():
+                total[key] += value
+
+    aggregate = [
+        {**point(bucket, {key: total[key] for key in TREND_KEYS}),
+         "facilities": total["facilities"]}
+        for bucket, total in sorted(totals.items())
+    ]
+    yield '], "aggregate": ' + json.dumps(aggregate) + "}"
@@ -6,14 +6,30 @@ urlpatterns = [
     path("health/", views.health_check, name="health_check"),
     path("reporter/report/", views.ReporterResourceReportView.as_view(),
          name="reporter_resource_report"),
+    path("admin/reports/bulk/", views.AdminBulkResourceReportView.as_view(),
+         name="admin_bulk_resource_report"),
+    path("reporter/report/backlog/", views.ReporterBacklogView.as_view(),
+         name="reporter_report_backlog"),
     path("monitor/dashboard/", views.MonitorDashboardView.as_view(),
          name="monitor_dashboard"),
+    path("monitor/dashboard/changes/", views.MonitorDashboardChangesView.as_view(),
+         name="monitor_dashboard_changes"),
+    path("monitor/dashboard/stream/token/", views.MonitorDashboardStreamTokenView.as_view(),
+         name="monitor_dashboard_stream_token"),
+    path("monitor/dashboard/stream/", views.monitor_dashboard_stream,
+         name="monitor_dashboard_stream"),
     path("monitor/dashboard/export/", views.MonitorExportDashboardView.as_view(),
          name="monitor_export_dashboard"),
     path("monitor/trend/", views.MonitorTrendView.as_view(),
          name="monitor_trend"),
+    path("monitor/history/export/", views.MonitorExportHistoryView.as_view(),
+         name="monitor_export_history"),
     path("admin/create-user/", views.AdminCreateUserView.as_view(),
          name="admin_create_user"),
+    path("admin/users/bulk/", views.AdminBulkCreateUsersView.as_view(),
+         name="admin_bulk_create_users"),
+    path("admin/users/actions/", views.AdminBulkUserActionView.as_view(),
+         name="admin_bulk_user_action"),
     path("admin/users/list/", views.AdminUserListView.as_view(),
          name="admin_list_users"),
     path("admin/users/<int:user_id>/", views.AdminUserDetailView.as_view(),
@@ -22,6 +38,10 @@ urlpatterns = [
          name="admin_export_users"),
     path("admin/facilities/", views.AdminFacilityView.as_view(),
          name="admin_facilities"),
+    path("admin/facilities/import/", views.AdminFacilityImportView.as_view(),
+         name="admin_facility_import"),
+    path("facilities/search/", views.FacilitySearchView.as_view(),
+         name="facility_search"),
     path("admin/stats/", views.AdminPlatformStatsView.as_view(),
          name="admin_platform_stats"),
     path("admin/settings/", views.AdminSettingsListView.as_view(),
@@ -32,4 +52,8 @@ urlpatterns = [
          name="admin_settings_initialize"),
     path("settings/public/", views.PublicSettingsView.as_view(),
          name="public_settings"),
+    path("jobs/<int:job_id>/", views.JobStatusView.as_view(),
+         name="job_status"),
+    path("jobs/<int:job_id>/download/", views.JobDownloadView.as_view(),
+         name="job_download"),
 ]
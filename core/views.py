@@ -1,20 +1,49 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.utils import timezone
-from datetime import timedelta
-
-from .models import ResourceReport, User, Facility, ResourceReportHistory
+from rest_framework.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import (
+    RESOURCE_FIELDS,
+    Job,
+    ResourceReport,
+    User,
+    Facility,
+    ResourceReportHistory,
+    critical_condition,
+)
 from .serializers import (
     ResourceReportSerializer,
+    BulkResourceReportItemSerializer,
+    OfflineReadingSerializer,
     DashboardFacilityReportSerializer,
     AdminCreateUserSerializer,
     FacilitySerializer,
     AdminUserListSerializer,
+    JobSerializer,
 )
+from . import caching, conditional, jobs, trends
+from .broadcast import broadcaster
+from .cursors import decode_cursor, encode_cursor
+from .exports import (
+    EXPORT_CHUNK_SIZE,
+    Dataset,
+    ExportContentNegotiation,
+    export_format,
+    export_response,
+    status_style,
+)
+from .idempotency import idempotent
+from .pagination import paginate, parse_fields, sparse_queryset
+from .reporting import save_backlog, save_reports, submit_report
 from .permissions import ReporterOnly, MonitorOnly, MonitorOrAdmin, AdminOnly
+from .settings_registry import DEFAULT_SETTINGS, THRESHOLD_KEYS, get_settings
 
 
 @api_view(["GET"])
@@ -50,6 +79,10 @@ class ReporterResourceReportView(APIView):
     permission_classes = [IsAuthenticated, ReporterOnly]
 
     def _upsert(self, request):
+        # Retries carrying the same Idempotency-Key replay the first response
+        return idempotent(request, lambda: self._save(request))
+
+    def _save(self, request):
         user = request.user
         if not getattr(user, "facility", None):
             return Response({"detail": "Assigned facility required for reporters."}, status=status.HTTP_400_BAD_REQUEST)
@@ -57,18 +90,8 @@ class ReporterResourceReportView(APIView):
         serializer = ResourceReportSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        report, _ = ResourceReport.objects.update_or_create(
-            facility=user.facility,
-            defaults=serializer.validated_data,
-        )
-
-        # Save historical snapshot
-        ResourceReportHistory.objects.create(
-            facility=user.facility,
-            icu_beds_available=report.icu_beds_available,
-            ventilators_available=report.ventilators_available,
-            staff_on_duty=report.staff_on_duty,
-        )
+        # Atomic upsert; history is only written when the numbers changed
+        report, _ = submit_report(user.facility, serializer.validated_data)
 
         return Response(ResourceReportSerializer(report).data, status=status.HTTP_200_OK)
 
@@ -79,96 +102,536 @@ class ReporterResourceReportView(APIView):
         return self._upsert(request)
 
 
+class ReporterBacklogView(APIView):
+    """Upload readings a reporter queued while offline, with their own timestamps"""
+    permission_classes = [IsAuthenticated, ReporterOnly]
+    max_items = 500
+
+    def post(self, request):
+        return idempotent(request, lambda: self._save(request))
+
+    def _save(self, request):
+        user = request.user
+        if not getattr(user, "facility", None):
+            return Response({"detail": "Assigned facility required for reporters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = request.data.get("readings") if isinstance(
+            request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of readings."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({"detail": f"At most {self.max_items} readings per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {"system_settings": get_settings()}
+        results = []
+        readings = []
+        for index, item in enumerate(items):
+            serializer = OfflineReadingSerializer(data=item, context=context)
+            if serializer.is_valid():
+                readings.append(serializer.validated_data)
+                results.append({"index": index, "status": "ok"})
+            else:
+                results.append(
+                    {"index": index, "status": "error", "errors": serializer.errors})
+
+        readings.sort(key=lambda reading: reading["recorded_at"])
+        report = save_backlog(user.facility, readings)
+
+        return Response({
+            "saved": len(readings),
+            "failed": len(items) - len(readings),
+            "report": ResourceReportSerializer(report).data if report else None,
+            "results": results,
+        })
+
+
+class AdminBulkResourceReportView(APIView):
+    """Upsert resource reports for many facilities in one request"""
+    permission_classes = [IsAuthenticated, AdminOnly]
+    max_items = 1000
+
+    def post(self, request):
+        return idempotent(request, lambda: self._save(request))
+
+    def _save(self, request):
+        items = request.data.get("reports") if isinstance(
+            request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of reports."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({"detail": f"At most {self.max_items} reports per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = BulkResourceReportItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, dict(serializer.validated_data)))
+            else:
+                results[index] = {
+                    "index": index,
+                    "facility_id": item.get("facility_id") if isinstance(item, dict) else None,
+                    "status": "error",
+                    "errors": serializer.errors,
+                }
+
+        facilities = Facility.objects.in_bulk(
+            {data["facility_id"] for _, data in valid})
+        entries = []
+        positions = []
+        seen = set()
+        for index, data in valid:
+            facility_id = data.pop("facility_id")
+            facility = facilities.get(facility_id)
+            if facility is None:
+                errors = {"facility_id": ["Facility not found."]}
+            elif facility_id in seen:
+                errors = {"facility_id": [
+                    "Facility appears more than once in this batch."]}
+            else:
+                seen.add(facility_id)
+                entries.append((facility, data))
+                positions.append(index)
+                continue
+            results[index] = {"index": index, "facility_id": facility_id,
+                              "status": "error", "errors": errors}
+
+        reports = save_reports(entries)
+        for index, report in zip(positions, reports):
+            results[index] = {
+                "index": index,
+                "facility_id": report.facility_id,
+                "status": "ok",
+                "report": ResourceReportSerializer(report).data,
+            }
+
+        return Response({
+            "saved": len(reports),
+            "failed": len(items) - len(reports),
+            "results": results,
+        })
+
+
+# ?order= values accepted by the dashboard endpoints
+DASHBOARD_ORDERING = {
+    "facility_name": "facility__name",
+    "country": "facility__country",
+    "city": "facility__city",
+    "status": "status",
+    "last_updated": "last_updated",
+    "icu_beds_available": "icu_beds_available",
+    "ventilators_available": "ventilators_available",
+    "staff_on_duty": "staff_on_duty",
+}
+# Orders an index serves page by page (?limit= / ?cursor=); the status is
+# computed from the thresholds and the counts change with every report
+DASHBOARD_KEYSET_ORDERING = ("facility_name", "country", "city", "last_updated")
+
+
+# Model paths read by each dashboard field, for ?fields=
+DASHBOARD_FIELD_COLUMNS = {
+    "facility_id": ["facility_id"],
+    "facility_name": ["facility__name"],
+    "country": ["facility__country"],
+    "city": ["facility__city"],
+    "icu_beds_available": ["icu_beds_available"],
+    "ventilators_available": ["ventilators_available"],
+    "staff_on_duty": ["staff_on_duty"],
+    "last_updated": ["last_updated"],
+    "status": [],
+}
+USER_FIELD_COLUMNS = {
+    "id": ["id"],
+    "username": ["username"],
+    "role": ["role"],
+    "facility": ["facility__id", "facility__name", "facility__country", "facility__city"],
+}
+FACILITY_FIELD_COLUMNS = {
+    "id": ["id"],
+    "name": ["name"],
+    "country": ["country"],
+    "city": ["city"],
+}
+
+
+def _paginated_response(request, queryset, serializer_class, context):
+    """Plain list, or a keyset page when ?limit= / ?cursor= is given"""
+    page = paginate(request, queryset)
+    if page is None:
+        return Response(serializer_class(queryset, many=True, context=context).data)
+    rows, next_cursor = page
+    return Response({
+        "results": serializer_class(rows, many=True, context=context).data,
+        "next": next_cursor,
+    })
+
+
+def _cached_response(request, parts, scopes, build):
+    """Response for ``build()``, cached until a scope changes.
+
+    The ETag follows the cache entry, so clients get 304 Not Modified until
+    a write changes any of the scopes.
+    """
+    parts = (*parts, request.user.role, request.query_params.urlencode())
+    key = caching.entry_key(parts, scopes)
+    etag = conditional.entry_etag(key)
+    not_modified = conditional.not_modified(request, etag, None)
+    if not_modified:
+        return not_modified
+    return conditional.set_validators(
+        Response(caching.fetch(parts, scopes, build, key)), etag, None)
+
+
+def _dashboard_queryset(params, system_settings):
+    """Status-annotated reports filtered and ordered from the query params"""
+    thresholds = system_settings.thresholds
+    queryset = ResourceReport.objects.select_related(
+        "facility").with_status(thresholds)
+
+    report_status = params.get("status")
+    if report_status:
+        report_status = report_status.upper()
+        if report_status == "CRITICAL":
+            queryset = queryset.filter(critical_condition(thresholds))
+        elif report_status == "OK":
+            queryset = queryset.exclude(critical_condition(thresholds))
+        else:
+            raise ValidationError({"status": "Must be CRITICAL or OK."})
+
+    for param in ("country", "city"):
+        value = params.get(param)
+        if value:
+            queryset = queryset.filter(**{f"facility__{param}": value})
+
+    order = params.get("order", "facility_name")
+    field = DASHBOARD_ORDERING.get(order.lstrip("-"))
+    if field is None:
+        raise ValidationError({
+            "order": f"Must be one of: {', '.join(DASHBOARD_ORDERING)} (prefix with - to reverse)."
+        })
+    tiebreaker = "facility_id"
+    if order.startswith("-"):
+        field, tiebreaker = f"-{field}", f"-{tiebreaker}"
+    # facility_id is unique, and pairs with the facility (column, id) indexes
+    return queryset.order_by(field, tiebreaker)
+
+
 class MonitorDashboardView(APIView):
     permission_classes = [IsAuthenticated, MonitorOrAdmin]
 
     def get(self, request):
-        queryset = ResourceReport.objects.select_related("facility").all()
-        serializer = DashboardFacilityReportSerializer(queryset, many=True)
-        return Response(serializer.data)
+        params = request.query_params
+        if ("limit" in params or "cursor" in params) and params.get(
+                "order", "facility_name").lstrip("-") not in DASHBOARD_KEYSET_ORDERING:
+            raise ValidationError({
+                "order": f"Pages can only be ordered by: {', '.join(DASHBOARD_KEYSET_ORDERING)}."
+            })
+        system_settings = get_settings()
+
+        def build():
+            fields = parse_fields(request, DASHBOARD_FIELD_COLUMNS)
+            queryset = sparse_queryset(
+                _dashboard_queryset(request.query_params, system_settings), fields, DASHBOARD_FIELD_COLUMNS)
+            response = _paginated_response(
+                request, queryset, DashboardFacilityReportSerializer,
+                {"system_settings": system_settings, "fields": fields})
+            return response.data
+
+        # Statuses depend on the thresholds, hence the settings version
+        return _cached_response(
+            request, ("dashboard", system_settings.version), [caching.REPORTS], build)
+
+
+def _valid_thresholds(thresholds):
+    """Whether a cursor's thresholds only name resource fields, with integer values"""
+    return isinstance(thresholds, dict) and set(thresholds) <= set(THRESHOLD_KEYS) and all(
+        isinstance(value, int) and not isinstance(value, bool) for value in thresholds.values())
+
+
+class MonitorDashboardChangesView(APIView):
+    """Dashboard rows changed since a cursor returned by a previous call"""
+    permission_classes = [IsAuthenticated, MonitorOrAdmin]
+
+    def get(self, request):
+        from django.utils.dateparse import parse_datetime
+
+        system_settings = get_settings()
+        thresholds = system_settings.thresholds
+        reports = ResourceReport.objects.select_related(
+            "facility").with_status(thresholds)
+
+        since = request.query_params.get("since")
+        if not since:
+            # No cursor yet: send the full table once
+            changed = reports.order_by("last_updated", "id")
+            flipped = ResourceReport.objects.none()
+            latest = None
+        else:
+            cursor = decode_cursor(since, param="since")
+            latest = parse_datetime(cursor.get("t") or "")
+            if latest is None:
+                raise ValidationError({"since": "Invalid cursor."})
+            changed = reports.filter(
+                last_updated__gt=latest).order_by("last_updated", "id")
+
+            # Rows whose status flipped because a threshold moved since the cursor
+            previous = cursor.get("th")
+            if previous is not None and not _valid_thresholds(previous):
+                raise ValidationError({"since": "Invalid cursor."})
+            if previous is not None and previous != thresholds:
+                was_critical = critical_condition(previous)
+                is_critical = critical_condition(thresholds)
+                flipped = reports.filter(last_updated__lte=latest).filter(
+                    (was_critical & ~is_critical) | (~was_critical & is_critical)
+                ).order_by("id")
+            else:
+                flipped = ResourceReport.objects.none()
 
+        changed = list(changed)
+        context = {"system_settings": system_settings}
+        changes = DashboardFacilityReportSerializer(
+            changed, many=True, context=context).data
+        status_changes = DashboardFacilityReportSerializer(
+            flipped, many=True, context=context).data
 
-class MonitorExportDashboardView(APIView):
-    """Export dashboard data to Excel"""
+        if changed:
+            latest = changed[-1].last_updated
+
+        return Response({
+            "full": not since,
+            "changes": changes,
+            "status_changes": status_changes,
+            "cursor": encode_cursor({
+                "t": latest.isoformat() if latest else "1970-01-01T00:00:00+00:00",
+                "th": thresholds,
+            }),
+        })
+
+
+# Seconds between keep-alive comments on idle dashboard streams
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+class MonitorDashboardStreamTokenView(APIView):
+    """Issue a short-lived token for opening a dashboard stream with ?token="""
     permission_classes = [IsAuthenticated, MonitorOrAdmin]
 
+    def post(self, request):
+        from django.conf import settings
+        from .authentication import stream_token
+
+        return Response({
+            "token": stream_token(request.user.id),
+            "expires_in": getattr(settings, "STREAM_TOKEN_SECONDS", 60),
+        })
+
+
+def _stream_user(request):
+    """Authenticate a stream request from a ?token= stream token or the Authorization header"""
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+    from .authentication import ClaimsJWTAuthentication, stream_user
+
+    # EventSource cannot send headers; the URL only ever carries a stream
+    # token, never an access token, since URLs end up in logs
+    token = request.GET.get("token")
+    if token:
+        return stream_user(token)
+    auth = ClaimsJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def monitor_dashboard_stream(request):
+    """Server-Sent Events stream of dashboard rows as reporters submit them.
+
+    Requires the ASGI entry point (hfrat_backend.asgi); each event carries one
+    row in the dashboard format, keyed by facility_id.
+    """
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    request.user = user
+    permission = MonitorOrAdmin()
+    if not permission.has_permission(request, None):
+        return JsonResponse({"detail": permission.message}, status=status.HTTP_403_FORBIDDEN)
+
+    async def events():
+        subscriber = broadcaster.subscribe()
+        queue = subscriber[1]
+        try:
+            # Ask EventSource to reconnect after 5s if the stream drops
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: report\ndata: {message}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+MAX_SELECTED_FACILITIES = 1000
+
+
+def _selected_facilities(params):
+    """Facilities picked by ?facility_ids= (or ``all``), ?country= and ?city=.
+
+    None when none of those parameters is given.
+    """
+    facility_ids = params.get("facility_ids")
+    if not (facility_ids or params.get("country") or params.get("city")):
+        return None
+
+    facilities = Facility.objects.all()
+    if facility_ids and facility_ids != "all":
+        try:
+            ids = {int(value) for value in facility_ids.split(",") if value.strip()}
+        except ValueError:
+            raise ValidationError(
+                {"detail": "facility_ids must be a comma-separated list of IDs or 'all'"})
+        if len(ids) > MAX_SELECTED_FACILITIES:
+            raise ValidationError(
+                {"detail": f"At most {MAX_SELECTED_FACILITIES} facility_ids per request."})
+        facilities = facilities.filter(id__in=ids)
+    for param in ("country", "city"):
+        value = params.get(param)
+        if value:
+            facilities = facilities.filter(**{param: value})
+    return facilities
+
+
+def _parse_moment(params, name):
+    """Aware datetime from an ISO date or datetime query parameter"""
+    from datetime import datetime, time
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date, parse_datetime
+
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({name: "Must be an ISO 8601 date or datetime."})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class BaseExportView(APIView):
+    """Sends ``dataset()`` in the ?format= requested.
+
+    With ``?async=1`` the export is queued as a background job instead and
+    the response is 202 with the job; poll ``/api/jobs/<id>/`` and fetch the
+    file from its ``download_url``. Views with ``shardable`` set also accept
+    ``?shard=country`` with ``?async=1`` for a zip of one file per country.
+    """
+    content_negotiation_class = ExportContentNegotiation
+    formats = ("xlsx", "csv", "ndjson")
+    default_format = "xlsx"
+    job_kind = None
+    shardable = False
+    # (CSV/NDJSON key, queryset path, Excel header, Excel column width)
+    columns = []
+
+    @classmethod
+    def dataset(cls, params):
+        raise NotImplementedError
+
+    @classmethod
+    def _values(cls, queryset):
+        return queryset.values_list(
+            *[path for _, path, _, _ in cls.columns]
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    @classmethod
+    def _labels(cls):
+        return [(key, header, width) for key, _, header, width in cls.columns]
+
+    @classmethod
+    def shards(cls, params):
+        """Countries of the facilities the export covers"""
+        facilities = Facility.objects.all()
+        for param in ("country", "city"):
+            value = params.get(param)
+            if value:
+                facilities = facilities.filter(**{param: value})
+        return list(facilities.order_by("country").values_list(
+            "country", flat=True).distinct())
+
     def get(self, request):
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from django.http import HttpResponse
+        export = export_format(request, self.formats, self.default_format)
+        params = request.query_params.dict()
+        run_async = params.pop("async", "").lower() in ("1", "true")
+        shard = params.get("shard")
+        if shard and not (self.shardable and shard == "country"):
+            raise ValidationError({
+                "shard": "Must be country." if self.shardable else "Not supported by this export."
+            })
+        if shard and not run_async:
+            # Encoding shards forks a process pool; keep that in the job worker
+            raise ValidationError({"shard": "Only available with ?async=1."})
+        # Building the dataset validates the parameters; rows load lazily
+        dataset = self.dataset(params)
+        if not run_async:
+            return export_response(request, dataset, export)
+
+        job = jobs.enqueue(
+            self.job_kind, request.user.id, {**params, "format": export})
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class MonitorExportDashboardView(BaseExportView):
+    """Export dashboard data to Excel, CSV or NDJSON (?format=)"""
+    permission_classes = [IsAuthenticated, MonitorOrAdmin]
+    job_kind = Job.Kind.DASHBOARD_EXPORT
+    shardable = True
+    columns = [
+        ("facility_name", "facility__name", "Facility Name", 25),
+        ("city", "facility__city", "City", 15),
+        ("country", "facility__country", "Country", 15),
+        ("icu_beds_available", "icu_beds_available", "ICU Beds Available", 18),
+        ("ventilators_available", "ventilators_available", "Ventilators Available", 20),
+        ("staff_on_duty", "staff_on_duty", "Staff on Duty", 15),
+        ("status", "status", "Status", 12),
+        ("last_updated", "last_updated", "Last Updated", 20),
+    ]
+
+    @classmethod
+    def dataset(cls, params):
         from datetime import datetime
 
-        reports = ResourceReport.objects.select_related(
-            "facility").all().order_by("facility__name")
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Dashboard Report"
-
-        # Header styling
-        header_fill = PatternFill(
-            start_color="2563eb", end_color="2563eb", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True, size=12)
-        header_alignment = Alignment(horizontal="center", vertical="center")
-
-        # Headers
-        headers = ["Facility Name", "City", "Country", "ICU Beds Available",
-                   "Ventilators Available", "Staff on Duty", "Status", "Last Updated"]
-        ws.append(headers)
-
-        # Style header row
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-
-        # Data rows
-        for report in reports:
-            status = "CRITICAL" if report.icu_beds_available == 0 else "OK"
-            row = [
-                report.facility.name,
-                report.facility.city,
-                report.facility.country,
-                report.icu_beds_available,
-                report.ventilators_available,
-                report.staff_on_duty,
-                status,
-                report.last_updated.strftime(
-                    '%Y-%m-%d %H:%M:%S') if report.last_updated else "N/A",
-            ]
-            ws.append(row)
-
-            # Color-code status cells
-            last_row = ws.max_row
-            status_cell = ws.cell(row=last_row, column=7)
-            if status == "CRITICAL":
-                status_cell.fill = PatternFill(
-                    start_color="fee2e2", end_color="fee2e2", fill_type="solid")
-                status_cell.font = Font(color="b91c1c", bold=True)
-            else:
-                status_cell.fill = PatternFill(
-                    start_color="ecfdf3", end_color="ecfdf3", fill_type="solid")
-                status_cell.font = Font(color="166534", bold=True)
-
-        # Adjust column widths
-        ws.column_dimensions['A'].width = 25
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 18
-        ws.column_dimensions['E'].width = 20
-        ws.column_dimensions['F'].width = 15
-        ws.column_dimensions['G'].width = 12
-        ws.column_dimensions['H'].width = 20
-
-        # Create HTTP response
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        return Dataset(
+            f"dashboard_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "Dashboard Report",
+            cls._labels(),
+            cls._values(_dashboard_queryset(params, get_settings())),
+            xlsx_row=lambda row: (
+                *row[:7], row[7].strftime('%Y-%m-%d %H:%M:%S') if row[7] else "N/A"),
+            header_style="export_header",
+            cell_styles={6: status_style},
         )
-        filename = f"dashboard_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-        wb.save(response)
-        return response
 
 
 class AdminCreateUserView(APIView):
@@ -181,13 +644,51 @@ class AdminCreateUserView(APIView):
         return Response(serializer.to_representation(user), status=status.HTTP_201_CREATED)
 
 
+class AdminBulkCreateUsersView(APIView):
+    """Create many users from a JSON list or a CSV file in one request"""
+    permission_classes = [IsAuthenticated, AdminOnly]
+    # Passwords are hashed in this process, a fraction of a second each;
+    # larger files go through manage.py provision_users
+    max_items = 100
+
+    def get_parsers(self):
+        from rest_framework.parsers import JSONParser, MultiPartParser
+        from .provisioning import CSVParser
+
+        return [JSONParser(), CSVParser(), MultiPartParser()]
+
+    def post(self, request):
+        return idempotent(request, lambda: self._save(request))
+
+    def _save(self, request):
+        from .provisioning import provision_users, read_csv
+
+        if "file" in request.FILES:
+            items = read_csv(request.FILES["file"])
+        else:
+            items = request.data.get("users") if isinstance(
+                request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({"detail": f"At most {self.max_items} users per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, results = provision_users(items)
+        return Response({
+            "created": created,
+            "failed": len(items) - created,
+            "results": results,
+        })
+
+
 class AdminFacilityView(APIView):
     permission_classes = [IsAuthenticated, AdminOnly]
 
     def get(self, request):
-        facilities = Facility.objects.all().order_by("name")
-        data = FacilitySerializer(facilities, many=True).data
-        return Response(data)
+        fields = parse_fields(request, FACILITY_FIELD_COLUMNS)
+        facilities = sparse_queryset(
+            Facility.objects.order_by("name", "id"), fields, FACILITY_FIELD_COLUMNS)
+        return _paginated_response(request, facilities, FacilitySerializer, {"fields": fields})
 
     def post(self, request):
         serializer = FacilitySerializer(data=request.data)
@@ -197,12 +698,178 @@ class AdminFacilityView(APIView):
 
 
 class AdminUserListView(APIView):
+    """Users ordered by username, optionally filtered.
+
+    ``q`` matches a username prefix (case-insensitive, indexed); ``role``
+    and ``facility_id`` filter exactly.
+    """
     permission_classes = [IsAuthenticated, AdminOnly]
 
     def get(self, request):
-        users = User.objects.select_related("facility").order_by("username")
-        data = AdminUserListSerializer(users, many=True).data
-        return Response(data)
+        params = request.query_params
+        users = User.objects.select_related("facility").order_by("username", "id")
+        query = params.get("q", "").strip()
+        if query:
+            users = users.filter(username__istartswith=query)
+        role = params.get("role")
+        if role:
+            role = role.upper()
+            if role not in User.Role.values:
+                raise ValidationError({"role": f"Must be one of: {', '.join(User.Role.values)}."})
+            users = users.filter(role=role)
+        facility_id = params.get("facility_id")
+        if facility_id:
+            if not facility_id.isdigit():
+                raise ValidationError({"facility_id": "Must be a facility ID."})
+            users = users.filter(facility_id=int(facility_id))
+
+        fields = parse_fields(request, USER_FIELD_COLUMNS)
+        users = sparse_queryset(users, fields, USER_FIELD_COLUMNS)
+        return _paginated_response(request, users, AdminUserListSerializer, {"fields": fields})
+
+
+class AdminBulkUserActionView(APIView):
+    """Change the role or facility of, or delete, many users in a few set-based queries.
+
+    Every change keeps the user_facility_role_requirement constraint:
+    MONITOR and ADMIN lose their facility, REPORTER needs one, and only
+    reporters can be moved to another facility. Changed users' tokens are
+    revoked.
+    """
+    permission_classes = [IsAuthenticated, AdminOnly]
+
+    def post(self, request):
+        from django.db import transaction
+        from django.db.models import F
+        from . import counters
+        from .authentication import forget_versions
+        from .serializers import AdminBulkUserActionSerializer
+
+        serializer = AdminBulkUserActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        action = data["action"]
+
+        with transaction.atomic():
+            rows = list(
+                User.objects.select_for_update().filter(id__in=data["ids"])
+                .order_by("id").values_list("id", "role", "facility_id")
+            )
+            ids = [user_id for user_id, _, _ in rows]
+            not_found = sorted(set(data["ids"]) - set(ids))
+            users = User.objects.filter(id__in=ids)
+
+            if action == "delete":
+                if request.user.id in ids:
+                    return Response({"detail": "Cannot delete your own account."}, status=status.HTTP_400_BAD_REQUEST)
+                # One counter update for the whole batch instead of one per user
+                with counters.deferred():
+                    users.delete()
+                # After the commit, or a concurrent request could cache the old version again
+                transaction.on_commit(lambda: forget_versions(ids))
+                return Response({"action": action, "deleted": len(ids), "not_found": not_found})
+
+            changes = {"token_version": F("token_version") + 1}
+            if action == "set_role":
+                role = changes["role"] = data["role"]
+                if role != User.Role.REPORTER:
+                    changes["facility_id"] = None
+                elif data.get("facility_id") is not None:
+                    changes["facility_id"] = data["facility_id"]
+                else:
+                    unassigned = [user_id for user_id, _, facility_id in rows if facility_id is None]
+                    if unassigned:
+                        return Response({
+                            "detail": "Reporters must be assigned to a facility; pass facility_id.",
+                            "ids": unassigned,
+                        }, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                others = [user_id for user_id, role, _ in rows if role != User.Role.REPORTER]
+                if others:
+                    return Response({
+                        "detail": "Only reporters can be assigned to a facility.",
+                        "ids": others,
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                changes["facility_id"] = data["facility_id"]
+
+            users.update(**changes)
+            caching.invalidate(caching.USERS)
+            if action == "set_role":
+                deltas = {}
+                for _, role, _ in rows:
+                    if role != data["role"]:
+                        deltas[counters.role_counter(role)] = deltas.get(counters.role_counter(role), 0) - 1
+                        deltas[counters.role_counter(data["role"])] = deltas.get(
+                            counters.role_counter(data["role"]), 0) + 1
+                counters.add(deltas)
+            # Tokens carry the role and facility; the version bump above revokes
+            # them once committed
+            transaction.on_commit(lambda: forget_versions(ids))
+        return Response({"action": action, "updated": len(ids), "not_found": not_found})
+
+
+class AdminFacilityImportView(APIView):
+    """Create facilities from a CSV file with name, country and city columns"""
+    permission_classes = [IsAuthenticated, AdminOnly]
+
+    def get_parsers(self):
+        # A text/csv body is read from request.stream instead of being parsed
+        from rest_framework.parsers import MultiPartParser
+
+        return [MultiPartParser()]
+
+    def post(self, request):
+        from .provisioning import import_facilities
+
+        if request.content_type.startswith("multipart/form-data"):
+            upload = request.FILES.get("file")
+            if upload is None:
+                return Response({"detail": "Upload the CSV file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+            summary = import_facilities(upload)
+        elif request.content_type.startswith("text/csv"):
+            summary = import_facilities(request.stream)
+        else:
+            return Response({"detail": "Send a text/csv body or a multipart 'file'."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        return Response(summary)
+
+
+class FacilitySearchView(APIView):
+    """Facilities whose name matches ?q=, for autocomplete.
+
+    Names starting with ``q`` come first, then (for 3+ characters) names
+    containing it, up to ?limit= results (default 10, at most 50). Both
+    lookups are case-insensitive and use the name search index.
+    """
+    permission_classes = [IsAuthenticated, MonitorOrAdmin]
+    default_limit = 10
+    max_limit = 50
+    min_substring_length = 3
+
+    def get(self, request):
+        params = request.query_params
+        query = params.get("q", "").strip()
+        if not query:
+            return Response({"detail": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(params.get("limit", self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= self.max_limit:
+            return Response({"detail": f"limit must be between 1 and {self.max_limit}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        facilities = Facility.objects.order_by("name", "id")
+        for param in ("country", "city"):
+            value = params.get(param)
+            if value:
+                facilities = facilities.filter(**{param: value})
+        columns = ("id", "name", "country", "city")
+
+        matches = list(facilities.filter(name__istartswith=query).values(*columns)[:limit])
+        if len(matches) < limit and len(query) >= self.min_substring_length:
+            matches += facilities.filter(name__icontains=query).exclude(
+                name__istartswith=query).values(*columns)[:limit - len(matches)]
+        return Response(matches)
 
 
 class AdminUserDetailView(APIView):
@@ -226,6 +893,7 @@ class AdminUserDetailView(APIView):
         serializer = AdminUpdateUserSerializer(
             user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
+        # Saving revokes the user's tokens if the role, facility or password changed
         updated_user = serializer.save()
         return Response(AdminUserListSerializer(updated_user).data)
 
@@ -236,54 +904,111 @@ class AdminUserDetailView(APIView):
             if user.id == request.user.id:
                 return Response({"detail": "Cannot delete your own account."}, status=status.HTTP_400_BAD_REQUEST)
             user.delete()
+            from .authentication import forget_versions
+            forget_versions([user_id])
             return Response({"detail": "User deleted successfully."}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({"detail": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
-class AdminExportUsersView(APIView):
+class AdminExportUsersView(BaseExportView):
+    """Export users to Excel, CSV or NDJSON (?format=)"""
     permission_classes = [IsAuthenticated, AdminOnly]
+    job_kind = Job.Kind.USERS_EXPORT
+    columns = [
+        ("id", "id", "ID", None),
+        ("username", "username", "Username", None),
+        ("role", "role", "Role", None),
+        ("facility_name", "facility__name", "Hospital", None),
+        ("city", "facility__city", "City", None),
+        ("country", "facility__country", "Country", None),
+    ]
+
+    @classmethod
+    def dataset(cls, params):
+        from datetime import datetime
 
-    def get(self, request):
-        from openpyxl import Workbook
-        from django.http import HttpResponse
+        return Dataset(
+            f"users_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "Users",
+            cls._labels(),
+            cls._values(User.objects.order_by("username")),
+            xlsx_row=lambda row: (*row[:3], *(value or "N/A" for value in row[3:])),
+        )
+
+
+class MonitorExportHistoryView(BaseExportView):
+    """Export raw report history as CSV or NDJSON (?format=), archived months included.
+
+    Optional filters: ``facility_ids`` (or ``all``), ``country``, ``city``
+    and ``since``/``until`` (ISO dates or datetimes).
+    """
+    permission_classes = [IsAuthenticated, MonitorOrAdmin]
+    formats = ("csv", "ndjson")
+    default_format = "csv"
+    job_kind = Job.Kind.HISTORY_EXPORT
+    shardable = True
+    columns = [(name, name, name, None) for name in
+               ("facility_id", "timestamp", *RESOURCE_FIELDS, "sample_count")]
+
+    @classmethod
+    def dataset(cls, params):
         from datetime import datetime
+        from itertools import chain
+        from . import archive
+
+        since = _parse_moment(params, "since")
+        until = _parse_moment(params, "until")
+        facilities = _selected_facilities(params)
+
+        history = ResourceReportHistory.objects.order_by("facility_id", "timestamp")
+        if since:
+            history = history.filter(timestamp__gte=since)
+        if until:
+            history = history.filter(timestamp__lt=until)
+        if facilities is not None:
+            history = history.filter(facility__in=facilities.values('id'))
+
+        # Archived months first, streamed from their segment files
+        archived_until = archive.horizon()
+        if archived_until and (since is None or since < archived_until):
+            facility_ids = None if facilities is None else set(
+                facilities.values_list('id', flat=True))
+            archived = archive.iter_history(
+                since, min(until, archived_until) if until else archived_until, facility_ids)
+            keys = [key for key, _, _, _ in cls.columns]
+            # The segment files own everything before the horizon; rows an
+            # interrupted archive run wrote but did not delete yet are
+            # still in the database
+            history = history.filter(timestamp__gte=archived_until)
+            rows = chain((tuple(row[key] for key in keys) for row in archived), cls._values(history))
+        else:
+            rows = cls._values(history)
 
-        users = User.objects.select_related("facility").order_by("username")
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Users"
-
-        # Headers
-        headers = ["ID", "Username", "Role", "Hospital", "City", "Country"]
-        ws.append(headers)
-
-        # Data rows
-        for user in users:
-            row = [
-                user.id,
-                user.username,
-                user.role,
-                user.facility.name if user.facility else "N/A",
-                user.facility.city if user.facility else "N/A",
-                user.facility.country if user.facility else "N/A",
-            ]
-            ws.append(row)
-
-        # Create HTTP response
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        return Dataset(
+            f"history_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "History",
+            cls._labels(),
+            rows,
         )
-        filename = f"users_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
 
-        wb.save(response)
-        return response
+    @classmethod
+    def shards(cls, params):
+        facilities = _selected_facilities(params)
+        if facilities is None:
+            facilities = Facility.objects.all()
+        return list(facilities.order_by("country").values_list(
+            "country", flat=True).distinct())
 
 
 class MonitorTrendView(APIView):
-    """API endpoint for 7-day historical trend data"""
+    """API endpoint for historical trend data (last 7 days by default).
+
+    ``facility_id`` returns one facility's series. ``facility_ids`` (comma
+    separated, or ``all``), ``country`` and ``city`` select several
+    facilities and stream their series plus a fleet aggregate. ``window``
+    and ``granularity`` pick the period and bucket size.
+    """
     permission_classes = [IsAuthenticated, MonitorOrAdmin]
 
     def get(self, request):
@@ -291,10 +1016,7 @@ class MonitorTrendView(APIView):
         facility_id = request.query_params.get('facility_id')
 
         if not facility_id:
-            return Response(
-                {"detail": "facility_id parameter is required"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return self._multi_facility(request)
 
         try:
             facility = Facility.objects.get(id=facility_id)
@@ -304,43 +1026,80 @@ class MonitorTrendView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get data from last 7 days
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        history = ResourceReportHistory.objects.filter(
-            facility=facility,
-            timestamp__gte=seven_days_ago
-        ).order_by('timestamp')
-
-        # Group by day and get daily averages
-        from django.db.models import Avg
-        from django.db.models.functions import TruncDate
-
-        daily_data = history.annotate(
-            day=TruncDate('timestamp')
-        ).values('day').annotate(
-            avg_beds=Avg('icu_beds_available'),
-            avg_vents=Avg('ventilators_available'),
-            avg_staff=Avg('staff_on_duty'),
-        ).order_by('day')
-
-        # Format response
-        trend_data = {
-            "facility_id": facility.id,
-            "facility_name": facility.name,
-            "city": facility.city,
-            "country": facility.country,
-            "data": [
-                {
-                    "date": item['day'].strftime('%Y-%m-%d'),
-                    "icu_beds": round(item['avg_beds'], 1),
-                    "ventilators": round(item['avg_vents'], 1),
-                    "staff": round(item['avg_staff'], 1),
-                }
-                for item in daily_data
-            ]
-        }
+        granularity, since = trends.parse_window(request.query_params)
+
+        def build():
+            buckets = trends.facility_buckets(facility.id, granularity, since)
+
+            # Format response
+            trend_data = {
+                "facility_id": facility.id,
+                "facility_name": facility.name,
+                "city": facility.city,
+                "country": facility.country,
+                "granularity": granularity,
+                "data": [
+                    trends.point(item['bucket'], trends.averages(item))
+                    for item in buckets
+                ]
+            }
+            return trend_data
+
+        # The window slides with the clock, hence ``since``
+        return _cached_response(
+            request, ("trend", facility.id, since),
+            [caching.trend_scope(facility.id), caching.trend_scope("all"),
+             caching.past_trend_scope(facility.id), caching.PAST_TRENDS],
+            build)
+
+    def _multi_facility(self, request):
+        params = request.query_params
+        granularity, since = trends.parse_window(params)
+        facilities = _selected_facilities(params)
+        if facilities is None:
+            return Response(
+                {"detail": "facility_id, facility_ids, country or city parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(trend_data)
+        rows = trends.trend_buckets(facilities.values('id'), granularity, since)
+        return StreamingHttpResponse(
+            trends.stream_trends(rows), content_type="application/json")
+
+
+class JobStatusView(APIView):
+    """Status of a background job started by the current user"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(id=job_id, created_by_id=request.user.id)
+        except Job.DoesNotExist:
+            return Response({"detail": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(JobSerializer(job).data)
+
+
+class JobDownloadView(APIView):
+    """Download the file produced by a finished job"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        from django.http import FileResponse
+
+        try:
+            job = Job.objects.get(id=job_id, created_by_id=request.user.id)
+        except Job.DoesNotExist:
+            return Response({"detail": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if job.status != Job.Status.SUCCEEDED:
+            return Response(
+                {"detail": f"Job is {job.status.lower()}; no file to download."},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            result = open(jobs.result_file(job), "rb")
+        except FileNotFoundError:
+            return Response({"detail": "Job result has expired"}, status=status.HTTP_410_GONE)
+        return FileResponse(result, as_attachment=True, filename=job.result_name)
 
 
 class AdminPlatformStatsView(APIView):
@@ -348,56 +1107,62 @@ class AdminPlatformStatsView(APIView):
     permission_classes = [IsAuthenticated, AdminOnly]
 
     def get(self, request):
-        from django.db.models import Count, Sum, Avg
-
-        # Count statistics
-        total_facilities = Facility.objects.count()
-        total_users = User.objects.count()
-        total_reports = ResourceReport.objects.count()
-        total_history_records = ResourceReportHistory.objects.count()
-
-        # User role breakdown
-        user_stats = User.objects.values('role').annotate(count=Count('role'))
-
-        # Resource totals
-        resource_totals = ResourceReport.objects.aggregate(
-            total_beds=Sum('icu_beds_available'),
-            total_vents=Sum('ventilators_available'),
-            total_staff=Sum('staff_on_duty'),
-            avg_beds=Avg('icu_beds_available'),
-            avg_vents=Avg('ventilators_available'),
-            avg_staff=Avg('staff_on_duty'),
-        )
+        system_settings = get_settings()
+        # The critical count depends on the thresholds, hence the settings version
+        return Response(caching.fetch(
+            ("stats", system_settings.version), [caching.REPORTS, caching.USERS],
+            lambda: self._stats(system_settings)))
+
+    def _stats(self, system_settings):
+        from . import counters
+
+        # Maintained on every write, so no table is scanned here
+        values = counters.snapshot()
+        total_reports = values.get(counters.REPORTS, 0)
+        totals = {
+            field: values.get(counters.resource_counter(field), 0)
+            for field in RESOURCE_FIELDS
+        }
+
+        def average(field):
+            return round(totals[field] / total_reports, 1) if total_reports else 0
 
-        # Critical facilities count
-        critical_facilities = ResourceReport.objects.filter(
-            icu_beds_available=0
+        def breakdown(prefix):
+            return {
+                name[len(prefix):]: count for name, count in values.items()
+                if name.startswith(prefix) and count
+            }
+
+        # Depends on the current thresholds; one row per facility
+        critical_facilities = ResourceReport.objects.critical(
+            system_settings.thresholds
         ).count()
 
-        # Facilities by country
-        facilities_by_country = Facility.objects.values('country').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        facilities_by_country = sorted(
+            breakdown(counters.COUNTRY_PREFIX).items(), key=lambda item: (-item[1], item[0]))
 
-        return Response({
+        return {
             "overview": {
-                "total_facilities": total_facilities,
-                "total_users": total_users,
+                "total_facilities": values.get(counters.FACILITIES, 0),
+                "total_users": values.get(counters.USERS, 0),
                 "total_reports": total_reports,
-                "total_history_records": total_history_records,
+                "total_history_records": values.get(counters.HISTORY, 0),
                 "critical_facilities": critical_facilities,
             },
-            "users_by_role": {item['role']: item['count'] for item in user_stats},
+            "users_by_role": breakdown(counters.ROLE_PREFIX),
             "resources": {
-                "total_beds": resource_totals['total_beds'] or 0,
-                "total_ventilators": resource_totals['total_vents'] or 0,
-                "total_staff": resource_totals['total_staff'] or 0,
-                "avg_beds_per_facility": round(resource_totals['avg_beds'] or 0, 1),
-                "avg_ventilators_per_facility": round(resource_totals['avg_vents'] or 0, 1),
-                "avg_staff_per_facility": round(resource_totals['avg_staff'] or 0, 1),
+                "total_beds": totals["icu_beds_available"],
+                "total_ventilators": totals["ventilators_available"],
+                "total_staff": totals["staff_on_duty"],
+                "avg_beds_per_facility": average("icu_beds_available"),
+                "avg_ventilators_per_facility": average("ventilators_available"),
+                "avg_staff_per_facility": average("staff_on_duty"),
             },
-            "facilities_by_country": list(facilities_by_country),
-        })
+            "facilities_by_country": [
+                {"country": country, "count": count}
+                for country, count in facilities_by_country
+            ],
+        }
 
 
 class AdminSettingsListView(APIView):
@@ -419,7 +1184,7 @@ class AdminSettingsListView(APIView):
 
         serializer = SystemSettingSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(updated_by=request.user)
+            serializer.save(updated_by_id=request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -458,7 +1223,7 @@ class AdminSettingsDetailView(APIView):
         serializer = SystemSettingUpdateSerializer(
             setting, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save(updated_by=request.user)
+            serializer.save(updated_by_id=request.user.id)
             # Return full setting data
             from .serializers import SystemSettingSerializer
             full_serializer = SystemSettingSerializer(setting)
@@ -487,50 +1252,17 @@ class AdminSettingsInitializeView(APIView):
     def post(self, request):
         from .models import SystemSetting
 
-        default_settings = [
-            {
-                "key": "critical_icu_beds_threshold",
-                "value": "5",
-                "description": "Minimum ICU beds before facility is marked CRITICAL",
-                "setting_type": "THRESHOLD"
-            },
-            {
-                "key": "critical_ventilators_threshold",
-                "value": "3",
-                "description": "Minimum ventilators before facility is marked CRITICAL",
-                "setting_type": "THRESHOLD"
-            },
-            {
-                "key": "critical_staff_threshold",
-                "value": "10",
-                "description": "Minimum staff on duty before facility is marked CRITICAL",
-                "setting_type": "THRESHOLD"
-            },
-            {
-                "key": "alert_notification_enabled",
-                "value": "true",
-                "description": "Enable or disable alert notifications",
-                "setting_type": "ALERT"
-            },
-            {
-                "key": "dashboard_refresh_interval",
-                "value": "60",
-                "description": "Dashboard auto-refresh interval in seconds",
-                "setting_type": "GENERAL"
-            },
-        ]
-
         created_count = 0
         existing_count = 0
 
-        for setting_data in default_settings:
+        for setting_data in DEFAULT_SETTINGS:
             _, created = SystemSetting.objects.get_or_create(
                 key=setting_data["key"],
                 defaults={
                     "value": setting_data["value"],
                     "description": setting_data["description"],
                     "setting_type": setting_data["setting_type"],
-                    "updated_by": request.user,
+                    "updated_by_id": request.user.id,
                 }
             )
             if created:
@@ -542,7 +1274,7 @@ class AdminSettingsInitializeView(APIView):
             "message": "Settings initialization complete",
             "created": created_count,
             "existing": existing_count,
-            "total": len(default_settings)
+            "total": len(DEFAULT_SETTINGS)
         })
 
 
@@ -551,17 +1283,13 @@ class PublicSettingsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from .models import SystemSetting
-
-        # Get threshold settings only
-        thresholds = SystemSetting.objects.filter(setting_type='THRESHOLD')
+        system_settings = get_settings()
 
-        result = {}
-        for setting in thresholds:
-            try:
-                # Try to convert to int for numeric thresholds
-                result[setting.key] = int(setting.value)
-            except ValueError:
-                result[setting.key] = setting.value
+        etag, last_modified = conditional.settings_validators(system_settings)
+        not_modified = conditional.not_modified(request, etag, last_modified)
+        if not_modified:
+            return not_modified
 
-        return Response(result)
+        # Threshold settings only, already parsed by the registry
+        response = Response(system_settings.of_type('THRESHOLD'))
+        return conditional.set_validators(response, etag, last_modified)
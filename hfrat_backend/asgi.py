@@ -3,14 +3,63 @@ ASGI config for hfrat_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Only the dashboard stream is served by Django's ASGI handler, so an open
+stream holds no thread. Every other request runs the WSGI application in a
+thread pool: under the ASGI handler Django runs all sync views in a single
+thread and buffers streaming bodies (exports, job downloads, trends) in
+memory before sending them.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
 import os
 
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
 from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hfrat_backend.settings')
 
-application = get_asgi_application()
+# Paths served by Django's ASGI handler (core.urls monitor_dashboard_stream)
+ASGI_PATHS = {'/api/monitor/dashboard/stream/'}
+
+
+def _closing(wsgi_application):
+    """Close each response once sent, as a WSGI server would.
+
+    Closing fires request_finished (database connections) and closes the
+    file behind a FileResponse.
+    """
+    def app(environ, start_response):
+        response = wsgi_application(environ, start_response)
+        try:
+            yield from response
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+    return app
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every request in one shared thread by default
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+class _ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _ThreadPoolWsgiInstance(
+            self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+django_asgi_application = get_asgi_application()
+wsgi_application = _ThreadPoolWsgiToAsgi(_closing(get_wsgi_application()))
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASGI_PATHS:
+        await wsgi_application(scope, receive, send)
+    else:
+        await django_asgi_application(scope, receive, send)
@@ -152,7 +152,7 @@ REST_FRAMEWORK= {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSIONos.environ.get(
     'CORS_ALLOWED_ORIGINS',
@@ -162,6 +162,72 @@ REST_FRAMEWORK= {
 # Allow credentials for CORS
 CORS_ALLOW_CREDENTIALS = True
 
+# Live dashboard updates: LocalBackend serves a single ASGI worker,
+# PostgresBackend shares updates between workers via LISTEN/NOTIFY. It is
+# the default when gunicorn runs several workers (WEB_CONCURRENCY) on
+# PostgreSQL.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+HFRAT_BROADCAST_BACKEND = os.environ.get(
+    'HFRAT_BROADCAST_BACKEND',
+    'core.broadcast.PostgresBackend'
+    if WEB_CONCURRENCY > 1 and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else 'core.broadcast.LocalBackend')
+
+# Lifetime of the tokens that open a dashboard stream (?token=)
+STREAM_TOKEN_SECONDS = int(os.environ.get('STREAM_TOKEN_SECONDS', '60'))
+
+# How long a report submission's Idempotency-Key can be replayed
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# Compressed segments of archived report history (see archive_history)
+HFRAT_ARCHIVE_DIR = os.environ.get('HFRAT_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Background jobs (manage.py run_jobs): where results are written, how long
+# they are kept, and how long a running job may miss heartbeats (sent every
+# minute) before it is retried
+JOB_OUTPUT_DIR = os.environ.get('JOB_OUTPUT_DIR', str(BASE_DIR / 'job_output'))
+JOB_RESULT_TTL_HOURS = int(os.environ.get('JOB_RESULT_TTL_HOURS', '24'))
+JOB_TIMEOUT_MINUTES = int(os.environ.get('JOB_TIMEOUT_MINUTES', '10'))
+
+# Processes encoding ?shard=country exports (default: one per CPU)
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '0')) or None
+
+# Cache behind the response cache and the token versions: db (default; the
+# table is created by createcachetable, shared by every process using the
+# database), locmem (one per process: only for a single process, since the
+# others' writes would not invalidate it) or file (CACHE_LOCATION is a
+# directory; shared on one host, but its locks are not atomic).
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'db')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', {
+            'locmem': 'hfrat',
+            'file': str(BASE_DIR / 'cache'),
+            'db': 'hfrat_cache',
+        }[CACHE_BACKEND]),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))},
+    }
+}
+
+# Upper bound on how long a cached response is served; writes invalidate
+# entries at once, this only limits how late a process that does not share
+# the cache sees them
+RESPONSE_CACHE_SECONDS = int(os.environ.get('RESPONSE_CACHE_SECONDS', '300'))
+
+# How long each worker trusts a cached user token version; a revocation
+# takes up to this long to reach workers that do not share the cache
+TOKEN_VERSION_CACHE_SECONDS = int(os.environ.get('TOKEN_VERSION_CACHE_SECONDS', '60'))
+# How long a worker trusts the copy it keeps in memory, which spares most
+# requests the shared cache's query; a revocation takes up to this long to
+# reach the other workers
+TOKEN_VERSION_LOCAL_SECONDS = int(os.environ.get('TOKEN_VERSION_LOCAL_SECONDS', '15'))
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
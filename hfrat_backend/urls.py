@@ -21,6 +21,10 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from core.authentication import (
+    ClaimsTokenObtainPairSerializer,
+    ClaimsTokenRefreshSerializer,
+)
 
 
 def home(request):
@@ -32,6 +36,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
     # JWT endpoints
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/', TokenObtainPairView.as_view(
+        serializer_class=ClaimsTokenObtainPairSerializer), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(
+        serializer_class=ClaimsTokenRefreshSerializer), name='token_refresh'),
 ]